@@ -1,63 +1,31 @@
+import os
 import sys
 import subprocess
-import socket
 from PyQt5.QtWidgets import QApplication, QMainWindow
 from ui.main_window import MainWindow
 
-NVR_COMMANDS = [
-    ["/bin/python3", "/home/risc3/new_nvring/NVRR/nvr1_project/main.py", "--camera_id", "2", "--port", "5002"],
-    ["/bin/python3", "/home/risc3/new_nvring/NVRR/nvr1_project/main.py", "--camera_id", "0", "--port", "5001"]
-]
+# Starts, pins, health-checks and restarts one NVR worker per camera (see config.py, SUPERVISOR_*)
+SUPERVISOR_SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'supervisor.py')
 
-processes = []
+supervisor_process = None
 
-def is_port_in_use(port):
-    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-        return s.connect_ex(('localhost', port)) == 0
-
-def kill_process_on_port(port):
-    result = subprocess.run(['sudo', 'lsof', '-t', '-i', f':{port}'], stdout=subprocess.PIPE, text=True)
-    pids = result.stdout.strip().split('\n')
-    for pid in pids:
-        if pid:
-            subprocess.run(['sudo', 'kill', '-9', pid])
-            print(f"Killed process {pid} on port {port}")
-
-def ensure_ports_are_free():
-    ports = [5001, 5002]
-    for port in ports:
-        if is_port_in_use(port):
-            print(f"Port {port} is in use. Trying to free the port...")
-            kill_process_on_port(port)
-            if is_port_in_use(port):
-                print(f"Failed to free port {port}.")
-                return False
-    return True
-
-def run_initial_commands():
-    global processes
-    for command in NVR_COMMANDS:
-        port = int(command[-1])
-        if is_port_in_use(port):
-            print(f"Port {port} is in use. Trying to free the port...")
-            kill_process_on_port(port)
-            if is_port_in_use(port):
-                print(f"Failed to free port {port}.")
-                return False
-        print(f"Starting NVR command: {' '.join(command)}")
-        p = subprocess.Popen(command)
-        processes.append(p)
-    return processes
+def start_supervisor():
+    global supervisor_process
+    print(f"Starting NVR supervisor: {SUPERVISOR_SCRIPT}")
+    supervisor_process = subprocess.Popen([sys.executable, SUPERVISOR_SCRIPT], cwd=os.path.dirname(SUPERVISOR_SCRIPT))
+    return supervisor_process
 
 def cleanup_processes():
-    global processes
-    for p in processes:
-        p.terminate()
-        try:
-            p.wait(timeout=10)
-        except subprocess.TimeoutExpired:
-            p.kill()
-    processes = []
+    global supervisor_process
+    if supervisor_process is None:
+        return
+    # The supervisor stops its workers gracefully on SIGTERM
+    supervisor_process.terminate()
+    try:
+        supervisor_process.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        supervisor_process.kill()
+    supervisor_process = None
 
 class StreamApp(QMainWindow):
     def __init__(self):
@@ -72,15 +40,7 @@ class StreamApp(QMainWindow):
         super(StreamApp, self).closeEvent(event)
 
 def main():
-    # Ensure ports 5001 and 5002 are free
-    if not ensure_ports_are_free():
-        print("Failed to ensure ports are free.")
-        return
-
-    # Run the initial commands to start the NVR applications
-    if not run_initial_commands():
-        print("Failed to start NVR applications.")
-        return
+    start_supervisor()
 
     # Start the stream application
     print("Starting the stream application...")
@@ -1,8 +1,11 @@
-from PyQt5.QtWidgets import QApplication
 import sys
-from app.main_window import MainWindow
 
 def main():
+    # Imported here so that importing the app package (e.g. app.engine on the
+    # headless server path) never pulls in PyQt5
+    from PyQt5.QtWidgets import QApplication
+    from app.main_window import MainWindow
+
     app = QApplication(sys.argv)
     main_window = MainWindow()
     main_window.show()
@@ -1,17 +1,142 @@
-import cv2
+import threading
+import time
+from collections import deque
+from app.sources import open_source
+
+class CapturedFrame:
+    __slots__ = ('seq', 'timestamp', 'image')
+
+    def __init__(self, seq, timestamp, image):
+        self.seq = seq
+        self.timestamp = timestamp
+        self.image = image
+
+class FrameSubscriber:
+    """
+    Consumer handle on a camera's frame buffer.
+
+    Remembers the sequence number of the last frame handed out so every
+    consumer sees each frame at most once, without taking frames away from
+    the other consumers.
+
+    missed counts frames drain() and next_batch() could not return because
+    the buffer wrapped before this consumer got to them; poll() and next()
+    skip to the newest frame by design and do not count.
+    """
+    def __init__(self, camera):
+        self.camera = camera
+        self.last_seq = 0
+        self.missed = 0
+
+    def poll(self):
+        """Return the newest frame not yet seen, or None without blocking."""
+        frame = self.camera.latest()
+        if frame is None or frame.seq <= self.last_seq:
+            return None
+        self.last_seq = frame.seq
+        return frame
+
+    def next(self, timeout=None):
+        """Block until a frame newer than the last one seen arrives."""
+        frame = self.camera.wait_for_frame(self.last_seq, timeout)
+        if frame is not None:
+            self.last_seq = frame.seq
+        return frame
+
+    def next_batch(self, timeout=None):
+        """Block until a new frame arrives, then return every unseen buffered frame, oldest first."""
+        if self.camera.wait_for_frame(self.last_seq, timeout) is None:
+            return []
+        return self.drain()
+
+    def drain(self):
+        """Return every buffered frame newer than the last one seen, oldest first."""
+        frames = self.camera.frames_since(self.last_seq)
+        if frames:
+            if self.last_seq:
+                self.missed += frames[0].seq - self.last_seq - 1
+            self.last_seq = frames[-1].seq
+        return frames
 
 class Camera:
-    def __init__(self, camera_id):
+    def __init__(self, camera_id, buffer_size=4, source=None, source_fps=None):
+        """
+        :param source: where frames come from, see app.sources.open_source;
+                       None reads the device whose index is camera_id.
+        :param source_fps: forced frame rate for file and synthetic sources.
+        """
         self.camera_id = camera_id
-        self.capture = cv2.VideoCapture(camera_id)
+        self.capture = open_source(camera_id if source is None else source, source_fps)
         self.connected = self.capture.isOpened()
+
+        self._buffer = deque(maxlen=buffer_size)
+        self._condition = threading.Condition()
+        self._seq = 0
+        self._running = False
+        self._thread = None
+
         if not self.connected:
             print(f"Warning: Camera with ID {camera_id} cannot be opened")
+        else:
+            self.start()
+
+    def start(self):
+        if self._running:
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._capture_loop, name=f"camera-{self.camera_id}", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._running = False
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+            self._thread = None
+        with self._condition:
+            self._condition.notify_all()
+
+    def release(self):
+        self.stop()
+        self.capture.release()
+        self.connected = False
+
+    def _capture_loop(self):
+        while self._running:
+            ret, image = self.capture.read()
+            if not ret:
+                # Device hiccup; back off briefly instead of spinning on read()
+                time.sleep(0.01)
+                continue
+            with self._condition:
+                self._seq += 1
+                self._buffer.append(CapturedFrame(self._seq, time.time(), image))
+                self._condition.notify_all()
+
+    def latest(self):
+        with self._condition:
+            return self._buffer[-1] if self._buffer else None
+
+    def wait_for_frame(self, after_seq=0, timeout=None):
+        """Return the newest frame with seq > after_seq, waiting up to timeout seconds."""
+        with self._condition:
+            self._condition.wait_for(
+                lambda: not self._running or (self._buffer and self._buffer[-1].seq > after_seq),
+                timeout)
+            if self._buffer and self._buffer[-1].seq > after_seq:
+                return self._buffer[-1]
+            return None
+
+    def frames_since(self, after_seq):
+        with self._condition:
+            return [frame for frame in self._buffer if frame.seq > after_seq]
+
+    def subscribe(self):
+        return FrameSubscriber(self)
 
     def get_frame(self):
         if not self.connected:
             return None
-        ret, frame = self.capture.read()
-        if not ret:
+        frame = self.latest()
+        if frame is None:
             return None
-        return frame
+        return frame.image
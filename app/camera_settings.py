@@ -0,0 +1,85 @@
+# app/camera_settings.py
+
+import glob
+import importlib.util
+import logging
+import os
+import re
+from config import MOTION_WORKING_WIDTH, MOTION_GRAYSCALE, MOTION_FRAME_STRIDE
+
+MOTION_KEYS = ("motion_working_width", "motion_grayscale", "motion_frame_stride", "motion_include_zones", "motion_exclude_zones")
+SOURCE_KEYS = ("source", "source_fps")
+
+def default_camera_settings(camera_id):
+    return {
+        "camera_id": camera_id,
+        "threshold": 1000,
+        "enable_face_detection": False,
+        "enable_person_detection": False,
+        "enable_vehicle_detection": False,
+        "enable_animal_detection": False,
+        "enable_explosion_detection": False,
+        "motion_working_width": MOTION_WORKING_WIDTH,
+        "motion_grayscale": MOTION_GRAYSCALE,
+        "motion_frame_stride": MOTION_FRAME_STRIDE,
+        "motion_include_zones": [],
+        "motion_exclude_zones": [],
+        # Device index camera_id unless set; see app.sources.open_source
+        "source": None,
+        "source_fps": None
+    }
+
+def load_camera_settings(filepath, default_id):
+    settings = default_camera_settings(default_id)
+    if os.path.exists(filepath):
+        spec = importlib.util.spec_from_file_location("settings", filepath)
+        settings_module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(settings_module)
+        for key, default in list(settings.items()):
+            settings[key] = getattr(settings_module, key, default)
+    return settings
+
+def save_camera_settings(filepath, camera_id, threshold, enable_face_detection, enable_person_detection, enable_vehicle_detection, enable_animal_detection, enable_explosion_detection, extra_settings=None):
+    with open(filepath, 'w') as f:
+        f.write(f"camera_id = {camera_id}\n")
+        f.write(f"threshold = {threshold}\n")
+        f.write(f"enable_face_detection = {enable_face_detection}\n")
+        f.write(f"enable_person_detection = {enable_person_detection}\n")
+        f.write(f"enable_vehicle_detection = {enable_vehicle_detection}\n")
+        f.write(f"enable_animal_detection = {enable_animal_detection}\n")
+        f.write(f"enable_explosion_detection = {enable_explosion_detection}\n")
+        for key, value in (extra_settings or {}).items():
+            f.write(f"{key} = {value!r}\n")
+
+def settings_path(settings_dir, camera_id):
+    return os.path.join(settings_dir, f'camera_{camera_id}.py')
+
+def load_all_camera_settings(settings_dir, camera_ids=None):
+    """
+    Settings for camera_ids, or for every camera_<n>.py in settings_dir.
+
+    When several files declare the same camera_id, camera_<camera_id>.py wins,
+    since that is the file save_camera_settings writes; otherwise the first
+    one does. The others are skipped.
+    """
+    if camera_ids is None:
+        camera_ids = []
+        for path in glob.glob(os.path.join(settings_dir, 'camera_*.py')):
+            match = re.match(r'camera_(\d+)\.py$', os.path.basename(path))
+            if match:
+                camera_ids.append(int(match.group(1)))
+        camera_ids.sort()
+
+    by_id = {}
+    for i in camera_ids:
+        settings = load_camera_settings(settings_path(settings_dir, i), i)
+        camera_id = settings["camera_id"]
+        kept = by_id.get(camera_id)
+        if kept is None:
+            by_id[camera_id] = (i, settings)
+        elif i == camera_id:
+            logging.warning(f"Skipping camera_{kept[0]}.py: camera_id {camera_id} is configured in camera_{i}.py")
+            by_id[camera_id] = (i, settings)
+        else:
+            logging.warning(f"Skipping camera_{i}.py: camera_id {camera_id} is already configured")
+    return [settings for _, settings in by_id.values()]
@@ -1,9 +1,30 @@
+import logging
+import os
 import sqlite3
+import threading
+import time
 from config import DATABASE_URI
 
-def init_db():
-    conn = sqlite3.connect(DATABASE_URI)
+# Columns added to recordings after the first schema; migrated in place by init_db()
+RECORDING_COLUMNS = [
+    ("camera_id", "INTEGER"),
+    ("start_time", "REAL"),
+    ("end_time", "REAL"),
+    ("frame_count", "INTEGER"),
+    ("byte_size", "INTEGER"),
+    ("kind", "TEXT"),  # 'segment' for continuous recording, 'event' for motion-triggered clips
+]
+
+def connect(database=DATABASE_URI):
+    conn = sqlite3.connect(database, timeout=30)
+    # WAL lets the API read while the writer threads commit; NORMAL is durable enough under WAL
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+def init_db(database=DATABASE_URI):
+    conn = connect(database)
     cursor = conn.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS recordings (
             id INTEGER PRIMARY KEY,
@@ -11,5 +32,256 @@ def init_db():
             timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
         )
     ''')
+    existing = {row[1] for row in cursor.execute("PRAGMA table_info(recordings)")}
+    for name, column_type in RECORDING_COLUMNS:
+        if name not in existing:
+            cursor.execute(f"ALTER TABLE recordings ADD COLUMN {name} {column_type}")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_recordings_camera_time ON recordings (camera_id, start_time)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_recordings_start_time ON recordings (start_time)")
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS events (
+            id INTEGER PRIMARY KEY,
+            camera_id INTEGER NOT NULL,
+            kind TEXT NOT NULL,
+            label TEXT,
+            confidence REAL,
+            x INTEGER, y INTEGER, w INTEGER, h INTEGER,
+            timestamp REAL NOT NULL,
+            frame_seq INTEGER,
+            track_id INTEGER,
+            recording TEXT
+        )
+    ''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_events_camera_time ON events (camera_id, timestamp)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_events_label_time ON events (label, timestamp)")
     conn.commit()
     conn.close()
+
+class BatchWriter:
+    """
+    Background thread that inserts rows with executemany in batches.
+
+    add() never touches SQLite; rows are committed once batch_size rows are
+    pending or flush_interval seconds have passed, whichever comes first.
+    """
+    def __init__(self, sql, database=DATABASE_URI, batch_size=50, flush_interval=2.0, name="db-writer"):
+        self.sql = sql
+        self.database = database
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.rows_written = 0
+
+        self._rows = []
+        self._condition = threading.Condition()
+        self._running = False
+        self._thread = None
+        self._name = name
+
+    def start(self):
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name=self._name, daemon=True)
+        self._thread.start()
+
+    def add(self, row):
+        with self._condition:
+            self._rows.append(row)
+            if len(self._rows) >= self.batch_size:
+                self._condition.notify()
+
+    def stop(self):
+        with self._condition:
+            self._running = False
+            self._condition.notify()
+        if self._thread is not None:
+            self._thread.join(timeout=10)
+            self._thread = None
+
+    def _run(self):
+        conn = connect(self.database)
+        try:
+            while True:
+                with self._condition:
+                    if self._running and len(self._rows) < self.batch_size:
+                        self._condition.wait(self.flush_interval)
+                    rows, self._rows = self._rows, []
+                    running = self._running
+                if rows:
+                    try:
+                        self._write(conn, rows)
+                        conn.commit()
+                        self.rows_written += len(rows)
+                    except sqlite3.Error as e:
+                        logging.error(f"Failed to write {len(rows)} rows: {e}")
+                if not running:
+                    break
+        finally:
+            conn.close()
+
+    def _write(self, conn, rows):
+        conn.executemany(self.sql, rows)
+
+class SegmentIndex(BatchWriter):
+    """
+    Closed recording files. Indexing a file also points the events that
+    happened during it (stored while it was still being written) at it.
+    """
+    SQL = '''
+        INSERT INTO recordings (filename, camera_id, start_time, end_time, frame_count, byte_size, kind)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    '''
+    LINK_EVENTS_SQL = '''
+        UPDATE events SET recording = ?
+        WHERE camera_id = ? AND timestamp >= ? AND timestamp <= ? AND recording IS NULL
+    '''
+
+    def __init__(self, database=DATABASE_URI, batch_size=20, flush_interval=5.0):
+        super(SegmentIndex, self).__init__(self.SQL, database, batch_size, flush_interval, name="segment-index")
+
+    def add_segment(self, camera_id, path, start_time, end_time, frame_count, byte_size, kind='segment'):
+        self.add((path, camera_id, start_time, end_time, frame_count, byte_size, kind))
+
+    def _write(self, conn, rows):
+        conn.executemany(self.sql, rows)
+        conn.executemany(self.LINK_EVENTS_SQL, [(path, camera_id, start_time, end_time)
+                                                for path, camera_id, start_time, end_time, _, _, _ in rows])
+
+def find_recordings(camera_id, start_time, end_time, database=DATABASE_URI):
+    """Segments of camera_id overlapping [start_time, end_time] (epoch seconds), oldest first."""
+    conn = connect(database)
+    try:
+        rows = conn.execute('''
+            SELECT filename, camera_id, start_time, end_time, frame_count, byte_size, kind
+            FROM recordings
+            WHERE camera_id = ? AND start_time < ? AND end_time > ?
+            ORDER BY start_time
+        ''', (camera_id, end_time, start_time)).fetchall()
+    finally:
+        conn.close()
+    keys = ("filename", "camera_id", "start_time", "end_time", "frame_count", "byte_size", "kind")
+    return [dict(zip(keys, row)) for row in rows]
+
+class EventStore(BatchWriter):
+    """
+    Detection and motion events. kind is 'detection' or 'motion'; recording
+    is the file holding the frame the event was found in, looked up by
+    timestamp: at insert if that file is already indexed, otherwise by
+    SegmentIndex once it is closed. Events are kept after retention deletes
+    that file.
+    """
+    SQL = '''
+        INSERT INTO events (camera_id, kind, label, confidence, x, y, w, h, timestamp, frame_seq, track_id, recording)
+        VALUES (?1, ?2, ?3, ?4, ?5, ?6, ?7, ?8, ?9, ?10, ?11, COALESCE(?12, (
+            SELECT filename FROM recordings
+            WHERE camera_id = ?1 AND start_time <= ?9 AND end_time >= ?9
+            ORDER BY start_time DESC LIMIT 1)))
+    '''
+
+    def __init__(self, database=DATABASE_URI, batch_size=100, flush_interval=1.0):
+        super(EventStore, self).__init__(self.SQL, database, batch_size, flush_interval, name="event-store")
+
+    def add_detection(self, detection, recording=None):
+        x, y, w, h = (int(v) for v in detection.bbox)
+        self.add((detection.camera_id, 'detection', detection.label, float(detection.confidence), x, y, w, h,
+                  detection.timestamp, detection.frame_seq, detection.track_id, recording))
+
+    def add_motion(self, camera_id, timestamp, bbox, frame_seq=None, recording=None):
+        x, y, w, h = (int(v) for v in bbox)
+        self.add((camera_id, 'motion', None, None, x, y, w, h, timestamp, frame_seq, None, recording))
+
+EVENT_COLUMNS = ("id", "camera_id", "kind", "label", "confidence", "x", "y", "w", "h",
+                 "timestamp", "frame_seq", "track_id", "recording")
+
+def find_events(camera_id=None, label=None, kind=None, start_time=None, end_time=None,
+                min_confidence=None, limit=100, offset=0, database=DATABASE_URI):
+    """Events matching every given filter, newest first; returns (events, total)."""
+    filters = []
+    params = []
+    for column, op, value in (("camera_id", "=", camera_id), ("label", "=", label), ("kind", "=", kind),
+                              ("timestamp", ">=", start_time), ("timestamp", "<", end_time),
+                              ("confidence", ">=", min_confidence)):
+        if value is not None:
+            filters.append(f"{column} {op} ?")
+            params.append(value)
+    where = f"WHERE {' AND '.join(filters)}" if filters else ""
+
+    conn = connect(database)
+    try:
+        total = conn.execute(f"SELECT COUNT(*) FROM events {where}", params).fetchone()[0]
+        rows = conn.execute(f"SELECT {', '.join(EVENT_COLUMNS)} FROM events {where} "
+                            f"ORDER BY timestamp DESC LIMIT ? OFFSET ?", params + [limit, offset]).fetchall()
+    finally:
+        conn.close()
+
+    events = []
+    for row in rows:
+        event = dict(zip(EVENT_COLUMNS, row))
+        event["bbox"] = [event.pop("x"), event.pop("y"), event.pop("w"), event.pop("h")]
+        events.append(event)
+    return events, total
+
+class RetentionManager:
+    """
+    Deletes recorded segments older than max_age seconds, then the oldest
+    segments until the total size is under max_bytes, on a background thread.
+    """
+    def __init__(self, database=DATABASE_URI, max_age=None, max_bytes=None, interval=60.0):
+        self.database = database
+        self.max_age = max_age
+        self.max_bytes = max_bytes
+        self.interval = interval
+        self.deleted = 0
+
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="retention", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=10)
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.enforce()
+            except Exception as e:
+                logging.error(f"Retention pass failed: {e}")
+
+    def _delete(self, conn, rows):
+        for row_id, filename in rows:
+            try:
+                os.remove(filename)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logging.error(f"Could not delete {filename}: {e}")
+                continue
+            conn.execute("DELETE FROM recordings WHERE id = ?", (row_id,))
+            self.deleted += 1
+        conn.commit()
+
+    def enforce(self):
+        conn = connect(self.database)
+        try:
+            if self.max_age is not None:
+                cutoff = time.time() - self.max_age
+                rows = conn.execute("SELECT id, filename FROM recordings WHERE end_time < ?", (cutoff,)).fetchall()
+                self._delete(conn, rows)
+
+            if self.max_bytes is not None:
+                total = conn.execute("SELECT COALESCE(SUM(byte_size), 0) FROM recordings").fetchone()[0]
+                if total > self.max_bytes:
+                    victims = []
+                    for row_id, filename, size in conn.execute(
+                            "SELECT id, filename, byte_size FROM recordings WHERE byte_size IS NOT NULL ORDER BY start_time"):
+                        if total <= self.max_bytes:
+                            break
+                        victims.append((row_id, filename))
+                        total -= size
+                    self._delete(conn, victims)
+        finally:
+            conn.close()
@@ -0,0 +1,115 @@
+# app/detection.py
+
+import threading
+from collections import OrderedDict
+import cv2
+
+class Detection:
+    __slots__ = ('label', 'confidence', 'bbox', 'camera_id', 'frame_seq', 'timestamp', 'track_id')
+
+    def __init__(self, label, confidence, bbox, camera_id=None, frame_seq=None, timestamp=None, track_id=None):
+        self.label = label
+        self.confidence = confidence
+        self.bbox = bbox  # (x, y, w, h) in frame pixels
+        self.camera_id = camera_id
+        self.frame_seq = frame_seq
+        self.timestamp = timestamp
+        self.track_id = track_id  # set by app.tracker for tracked objects
+
+    def __repr__(self):
+        return f"Detection({self.label!r}, {self.confidence:.2f}, {self.bbox}, camera={self.camera_id}, seq={self.frame_seq})"
+
+    def to_dict(self):
+        return {
+            "label": self.label,
+            "confidence": self.confidence,
+            "bbox": list(self.bbox),
+            "camera_id": self.camera_id,
+            "frame_seq": self.frame_seq,
+            "timestamp": self.timestamp,
+            "track_id": self.track_id,
+        }
+
+def detect_in_crops(detector, crops, camera_id=None, frame_seq=None, timestamp=None):
+    """
+    Run detector on each (x, y, image) crop and map boxes back to frame coordinates.
+
+    Pass the same crop objects to every detector of a frame so engines that
+    memoize by frame identity (YoloEngine) still do one pass per crop; with
+    FrameContext crops the RGB/blob conversions are shared as well.
+    """
+    detections = []
+    for x, y, crop in crops:
+        for detection in detector.detect(crop, camera_id, frame_seq, timestamp):
+            bx, by, bw, bh = detection.bbox
+            detection.bbox = (bx + x, by + y, bw, bh)
+            detections.append(detection)
+    return detections
+
+class DetectionCache:
+    """
+    Detector results keyed by (camera, frame sequence, detector name).
+
+    The first consumer asking for a key runs the detector; consumers asking
+    for the same key while it is running wait for that result instead of
+    running inference again. Old entries are evicted in LRU order.
+    """
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def get_or_compute(self, camera_id, frame_seq, name, compute):
+        key = (camera_id, frame_seq, name)
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key]
+            event = self._pending.get(key)
+            owner = event is None
+            if owner:
+                event = threading.Event()
+                self._pending[key] = event
+
+        if not owner:
+            event.wait()
+            with self._lock:
+                return self._entries.get(key, [])
+
+        result = []
+        try:
+            result = compute()
+        finally:
+            with self._lock:
+                self._entries[key] = result
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+                del self._pending[key]
+            event.set()
+        return result
+
+class OverlayRenderer:
+    DEFAULT_STYLE = ((0, 255, 0), 0.5)
+
+    def __init__(self, styles=None, show_confidence=False):
+        # label -> (BGR color, font scale)
+        self.styles = {
+            'Face': ((0, 255, 0), 0.9),
+            'Person': ((0, 255, 0), 0.9),
+            'Explosion': ((0, 0, 255), 0.9),
+        }
+        if styles:
+            self.styles.update(styles)
+        self.show_confidence = show_confidence
+
+    def draw(self, frame, detections):
+        for detection in detections:
+            color, font_scale = self.styles.get(detection.label, self.DEFAULT_STYLE)
+            x, y, w, h = (int(v) for v in detection.bbox)
+            text = detection.label
+            if self.show_confidence:
+                text = f"{text} {detection.confidence:.2f}"
+            cv2.rectangle(frame, (x, y), (x + w, y + h), color, 2)
+            cv2.putText(frame, text, (x, y - 10), cv2.FONT_HERSHEY_SIMPLEX, font_scale, color, 2)
+        return frame
@@ -1,12 +1,108 @@
 import cv2
+import numpy as np
+from app.frame_context import FrameContext
+
+def merge_regions(rects, gap=0):
+    """
+    Merge (x, y, w, h) rectangles that overlap or lie within gap pixels of each other.
+    """
+    merged = [list(r) for r in rects]
+    changed = True
+    while changed:
+        changed = False
+        result = []
+        while merged:
+            x, y, w, h = merged.pop()
+            i = 0
+            while i < len(merged):
+                ox, oy, ow, oh = merged[i]
+                if ox <= x + w + gap and x <= ox + ow + gap and oy <= y + h + gap and y <= oy + oh + gap:
+                    nx, ny = min(x, ox), min(y, oy)
+                    w, h = max(x + w, ox + ow) - nx, max(y + h, oy + oh) - ny
+                    x, y = nx, ny
+                    merged.pop(i)
+                    changed = True
+                else:
+                    i += 1
+            result.append([x, y, w, h])
+        merged = result
+    return [tuple(r) for r in merged]
+
+def pad_region(region, padding, frame_width, frame_height):
+    x, y, w, h = region
+    x0, y0 = max(0, x - padding), max(0, y - padding)
+    x1, y1 = min(frame_width, x + w + padding), min(frame_height, y + h + padding)
+    return (x0, y0, x1 - x0, y1 - y0)
 
 class MotionDetector:
-    def __init__(self, threshold=1000):
+    """
+    MOG2 background subtraction returning merged motion regions.
+
+    For cheap per-frame cost the frame can be downsampled to working_width
+    and/or converted to grayscale before subtraction; the contour area
+    threshold is scaled to match and regions are returned in full-frame
+    coordinates. include_zones/exclude_zones are lists of polygons in
+    full-frame pixels; with include zones only motion inside them counts,
+    motion inside exclude zones never does. With frame_stride N the
+    subtractor runs on every Nth frame and the last regions are reused.
+    """
+    def __init__(self, threshold=1000, merge_gap=20, working_width=None, grayscale=False,
+                 include_zones=None, exclude_zones=None, frame_stride=1):
         self.back_sub = cv2.createBackgroundSubtractorMOG2()
         self.threshold = threshold
+        self.merge_gap = merge_gap
+        self.working_width = working_width
+        self.grayscale = grayscale
+        self.include_zones = include_zones or []
+        self.exclude_zones = exclude_zones or []
+        self.frame_stride = max(1, frame_stride)
 
-    def detect(self, frame):
-        fg_mask = self.back_sub.apply(frame)
+        self._frame_count = 0
+        self._last_regions = []
+        self._zone_mask = None
+        self._zone_mask_key = None
+
+    def prepare(self, frame):
+        """
+        Downsample and convert a BGR frame (or FrameContext) to the working
+        form the subtractor sees; returns (working_frame, scale).
+        """
+        return FrameContext.wrap(frame).motion_frame(self.working_width, self.grayscale)
+
+    def _get_zone_mask(self, shape, scale):
+        if not self.include_zones and not self.exclude_zones:
+            return None
+        key = (shape[:2], scale)
+        if self._zone_mask_key != key:
+            height, width = shape[:2]
+            fill = 0 if self.include_zones else 255
+            mask = np.full((height, width), fill, dtype=np.uint8)
+            for zone in self.include_zones:
+                cv2.fillPoly(mask, [(np.array(zone, dtype=np.float32) * scale).astype(np.int32)], 255)
+            for zone in self.exclude_zones:
+                cv2.fillPoly(mask, [(np.array(zone, dtype=np.float32) * scale).astype(np.int32)], 0)
+            self._zone_mask = mask
+            self._zone_mask_key = key
+        return self._zone_mask
+
+    def detect_regions(self, frame, prepared=None):
+        """
+        Return the merged bounding boxes of every moving area above the threshold.
+
+        :param frame: BGR image or FrameContext.
+        :param prepared: optional (working_frame, scale) from prepare(), for
+                         callers that already computed it.
+        """
+        self._frame_count += 1
+        if (self._frame_count - 1) % self.frame_stride:
+            return self._last_regions
+
+        small, scale = prepared if prepared is not None else self.prepare(frame)
+        fg_mask = self.back_sub.apply(small)
+
+        zone_mask = self._get_zone_mask(fg_mask.shape, scale)
+        if zone_mask is not None:
+            fg_mask = cv2.bitwise_and(fg_mask, zone_mask)
 
         # Remove noise
         fg_mask = cv2.medianBlur(fg_mask, 5)
@@ -14,8 +110,15 @@ class MotionDetector:
         # Find contours
         contours, _ = cv2.findContours(fg_mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
 
-        for contour in contours:
-            if cv2.contourArea(contour) < self.threshold:
-                continue
-            return True
-        return False
+        # Areas shrink with the square of the downscale factor
+        threshold = self.threshold * scale * scale
+        rects = [cv2.boundingRect(contour) for contour in contours if cv2.contourArea(contour) >= threshold]
+        regions = merge_regions(rects, self.merge_gap * scale)
+        if scale != 1.0:
+            regions = [(int(x / scale), int(y / scale), int(np.ceil(w / scale)), int(np.ceil(h / scale))) for x, y, w, h in regions]
+
+        self._last_regions = regions
+        return regions
+
+    def detect(self, frame):
+        return bool(self.detect_regions(frame))
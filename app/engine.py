@@ -0,0 +1,494 @@
+# app/engine.py
+#
+# Headless multi-camera pipeline. Nothing here (or in anything it imports)
+# may pull in PyQt5: this is what the server path runs.
+
+import logging
+import threading
+import time
+from app.camera import Camera
+from app.camera_settings import load_all_camera_settings, save_camera_settings, settings_path, MOTION_KEYS, SOURCE_KEYS
+from app.database import init_db, SegmentIndex, RetentionManager, EventStore
+from app.detection import DetectionCache, OverlayRenderer, detect_in_crops
+from app.detector import MotionDetector, merge_regions, pad_region
+from app.frame_bus import FrameBusPublisher
+from app.frame_context import FrameContext
+from app.metrics import REGISTRY, process_gauges
+from app.model_registry import ModelRegistry, DETECTOR_CLASSES
+from app.process_pool import ProcessInferencePool
+from app.pipeline import Stage, StageQueue, DROP_OLDEST, KEEP_LATEST
+from app.recorder import Recorder, EventRecorder
+from app.streamer import MJPEGBroadcaster
+from app.tracker import TrackedDetector
+from config import CAMERA_SETTINGS_DIR, DATABASE_URI, INFERENCE_BATCHING, INFERENCE_BATCH_SIZE, INFERENCE_MAX_WAIT_MS, \
+    MOTION_GATING, ROI_PADDING, ROI_MAX_AREA_FRACTION, TRACKER_DETECT_EVERY_N_FRAMES, TRACKER_DETECT_INTERVAL, \
+    PIPELINE_RECORD_QUEUE_SIZE, PIPELINE_MOTION_QUEUE_SIZE, RECORDINGS_DIR, RECORDING_SEGMENT_SECONDS, \
+    RETENTION_MAX_AGE_DAYS, RETENTION_MAX_GB, RETENTION_CHECK_INTERVAL, RECORDING_MODE, EVENT_PRE_ROLL_SECONDS, \
+    EVENT_POST_ROLL_SECONDS, EVENT_PRE_ROLL_MAX_MB, EVENT_PRE_ROLL_JPEG, EVENTS_TRACK_INTERVAL, EVENTS_MOTION_INTERVAL, \
+    MODEL_IDLE_UNLOAD_SECONDS, INFERENCE_PROCESSES, INFERENCE_PROCESS_CPUS, INFERENCE_PROCESS_CV2_THREADS, \
+    INFERENCE_SHM_SLOT_MB, FRAME_BUS, FRAME_BUS_SLOTS, HEALTH_MAX_FRAME_AGE
+
+class CameraWorker:
+    """
+    Staged pipeline for one camera:
+
+        capture --> motion --> detect --> annotate/encode (broadcaster)
+           |
+           +--> record (Recorder writer thread)
+           |
+           +--> frame bus (shared memory, for other processes; FRAME_BUS)
+
+    Stages are threads joined by bounded StageQueues. The recorder reads the
+    camera buffer through its own subscriber into a blocking queue, so it
+    never loses frames because inference is slow and a slow disk never
+    stalls capture; motion drops its oldest frames and detection keeps only
+    the latest, so inference skips frames instead of stalling capture.
+    """
+    def __init__(self, engine, settings, camera):
+        self.engine = engine
+        self.camera_id = settings['camera_id']
+        self.settings = settings
+        self.camera = camera
+        self.subscriber = camera.subscribe()
+        self.motion_detector = MotionDetector(settings['threshold'],
+                                              working_width=settings['motion_working_width'],
+                                              grayscale=settings['motion_grayscale'],
+                                              include_zones=settings['motion_include_zones'],
+                                              exclude_zones=settings['motion_exclude_zones'],
+                                              frame_stride=settings['motion_frame_stride'])
+        if engine.recording_mode == 'event':
+            self.recorder = EventRecorder(camera, PIPELINE_RECORD_QUEUE_SIZE,
+                                          pre_roll_seconds=EVENT_PRE_ROLL_SECONDS,
+                                          post_roll_seconds=EVENT_POST_ROLL_SECONDS,
+                                          max_pre_roll_bytes=EVENT_PRE_ROLL_MAX_MB * 1024 ** 2,
+                                          compress_pre_roll=EVENT_PRE_ROLL_JPEG,
+                                          output_dir=engine.recordings_dir,
+                                          on_segment=engine.segment_index.add_segment)
+        else:
+            self.recorder = Recorder(camera, PIPELINE_RECORD_QUEUE_SIZE,
+                                     segment_seconds=RECORDING_SEGMENT_SECONDS,
+                                     output_dir=engine.recordings_dir if RECORDING_SEGMENT_SECONDS else None,
+                                     on_segment=engine.segment_index.add_segment)
+        self.recorder.write_latency = self._latency('record')
+        self.broadcaster = MJPEGBroadcaster(camera, engine.annotate_frame, fed=True, latency=self._latency('encode'))
+        self.frame_bus = FrameBusPublisher(self.camera_id, FRAME_BUS_SLOTS) if FRAME_BUS else None
+
+        self.motion_queue = StageQueue(f"motion-{self.camera_id}", PIPELINE_MOTION_QUEUE_SIZE, DROP_OLDEST)
+        self.detect_queue = StageQueue(f"detect-{self.camera_id}", 1, KEEP_LATEST)
+        self.stages = [
+            Stage(f"motion-{self.camera_id}", self.motion_queue, self._motion, self._latency('motion')),
+            Stage(f"detect-{self.camera_id}", self.detect_queue, self._detect, self._latency('detect')),
+        ]
+
+        self.motion_regions = []
+        self.motion_detected = False
+        self._last_motion_event = None
+        self._logged_tracks = {}  # (label, track_id) -> timestamp of its last stored event
+        self.frame_count = 0
+        self.fps = 0.0
+        self._fps_start = time.monotonic()
+
+        self._running = False
+        self._thread = None
+
+    def _latency(self, stage):
+        return REGISTRY.histogram('nvr_stage_latency_seconds', 'Time spent per frame in each pipeline stage.',
+                                  camera=self.camera_id, stage=stage)
+
+    def start(self):
+        # With recording 'off' the recorder is never started and submit() drops frames
+        if self.engine.recording_mode != 'off':
+            self.recorder.start_recording(None if self.recorder.output_dir else f'output_{self.camera_id}.avi')
+        for stage in self.stages:
+            stage.start()
+        self._running = True
+        self._thread = threading.Thread(target=self._capture, name=f"capture-{self.camera_id}", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._running = False
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+        for stage in self.stages:
+            stage.stop()
+        # Drains whatever capture already handed to the writer
+        self.recorder.stop_recording()
+        if self.frame_bus is not None:
+            self.frame_bus.close()
+        self.camera.release()
+
+    def _capture(self):
+        while self._running:
+            for captured in self.subscriber.next_batch(timeout=1.0):
+                self._count_frame()
+                if self.frame_bus is not None:
+                    self._publish(captured)
+                self.motion_queue.put(captured)
+
+    def _publish(self, captured):
+        try:
+            self.frame_bus.publish(captured)
+        except ValueError as e:
+            logging.error(f"Frame bus for camera {self.camera_id} disabled: {e}")
+            self.frame_bus.close()
+            self.frame_bus = None
+
+    def _count_frame(self):
+        self.frame_count += 1
+        now = time.monotonic()
+        if now - self._fps_start >= 1.0:
+            self.fps = self.frame_count / (now - self._fps_start)
+            self.frame_count = 0
+            self._fps_start = now
+
+    def _motion(self, captured):
+        # One context per frame, handed on to detection so conversions are shared
+        context = FrameContext(captured.image)
+        regions = self.motion_detector.detect_regions(context)
+        self.motion_regions = regions
+        self.motion_detected = bool(regions)
+        if regions:
+            if isinstance(self.recorder, EventRecorder):
+                self.recorder.trigger(captured.timestamp)
+            self._store_motion(captured, regions)
+        self.detect_queue.put((captured, regions, context))
+
+    def _detect(self, item):
+        captured, regions, context = item
+        detections = self.engine.detect_frame(self.camera_id, captured, regions, context)
+        if detections:
+            if isinstance(self.recorder, EventRecorder):
+                self.recorder.trigger(captured.timestamp)
+            self._store_detections(detections, captured.timestamp)
+        # The encoder draws these rather than looking the frame up again
+        self.broadcaster.submit(captured, detections)
+
+    def _store_motion(self, captured, regions):
+        # One row per burst of motion rather than per frame
+        if self._last_motion_event is not None and captured.timestamp - self._last_motion_event < EVENTS_MOTION_INTERVAL:
+            return
+        self._last_motion_event = captured.timestamp
+        x0 = min(x for x, _, _, _ in regions)
+        y0 = min(y for _, y, _, _ in regions)
+        x1 = max(x + w for x, _, w, _ in regions)
+        y1 = max(y + h for _, y, _, h in regions)
+        # The recording is resolved from the timestamp by the event store
+        self.engine.event_store.add_motion(self.camera_id, captured.timestamp, (x0, y0, x1 - x0, y1 - y0), captured.seq)
+
+    def _store_detections(self, detections, timestamp):
+        # Tracked objects are stored when first seen, then at most every EVENTS_TRACK_INTERVAL seconds
+        for detection in detections:
+            if detection.track_id is not None:
+                key = (detection.label, detection.track_id)
+                last = self._logged_tracks.get(key)
+                if last is not None and timestamp - last < EVENTS_TRACK_INTERVAL:
+                    continue
+                self._logged_tracks[key] = timestamp
+            self.engine.event_store.add_detection(detection)
+        if len(self._logged_tracks) > 1000:
+            self._logged_tracks = {key: last for key, last in self._logged_tracks.items()
+                                   if timestamp - last < EVENTS_TRACK_INTERVAL}
+
+    def stats(self):
+        return {
+            "fps": self.fps,
+            "queues": {q.name: q.stats() for q in (self.motion_queue, self.detect_queue)},
+            "recorder": self.recorder.stats(),
+            "stages": {stage.name: {"processed": stage.processed, "busy_seconds": stage.busy_time} for stage in self.stages},
+            "stream_clients": self.broadcaster.clients,
+            "frame_bus_published": self.frame_bus.published if self.frame_bus is not None else None,
+        }
+
+class NVREngine:
+    """
+    :param database: SQLite file for recordings and events.
+    :param recording_mode: 'continuous', 'event' or 'off'.
+    """
+    def __init__(self, camera_ids=None, settings_dir=CAMERA_SETTINGS_DIR, database=DATABASE_URI,
+                 recordings_dir=RECORDINGS_DIR, recording_mode=RECORDING_MODE):
+        self.settings_dir = settings_dir
+        self.database = database
+        self.recordings_dir = recordings_dir
+        self.recording_mode = recording_mode
+        self.camera_settings = load_all_camera_settings(settings_dir, camera_ids)
+
+        self.workers = {}
+        self._stopped = False
+        self.thresholds = {}
+        self.enable_face_detection = {}
+        self.enable_person_detection = {}
+        self.enable_vehicle_detection = {}
+        self.enable_animal_detection = {}
+        self.enable_explosion_detection = {}
+
+        init_db(database)
+        self.segment_index = SegmentIndex(database)
+        self.event_store = EventStore(database)
+        self.retention = RetentionManager(database, max_age=RETENTION_MAX_AGE_DAYS * 86400 if RETENTION_MAX_AGE_DAYS else None,
+                                          max_bytes=int(RETENTION_MAX_GB * 1024 ** 3) if RETENTION_MAX_GB else None,
+                                          interval=RETENTION_CHECK_INTERVAL)
+
+        self.detection_cache = DetectionCache()
+        self.tracked_detectors = {}
+        self._tracked_lock = threading.Lock()
+        self.detector_metrics = {}
+        self.overlay = OverlayRenderer()
+
+        self.process_pool = None
+        if INFERENCE_PROCESSES:
+            self.process_pool = ProcessInferencePool(DETECTOR_CLASSES, INFERENCE_PROCESSES, INFERENCE_PROCESS_CPUS,
+                                                     INFERENCE_PROCESS_CV2_THREADS,
+                                                     slot_bytes=INFERENCE_SHM_SLOT_MB * 1024 ** 2)
+        # Nothing is loaded until a camera enables it; see sync_detectors()
+        self.detectors = ModelRegistry(MODEL_IDLE_UNLOAD_SECONDS, on_load=self._detector_loaded,
+                                       process_pool=self.process_pool)
+
+        for settings in self.camera_settings:
+            camera_id = settings['camera_id']
+            try:
+                camera = Camera(camera_id, source=settings['source'], source_fps=settings['source_fps'])
+                if not camera.connected:
+                    logging.error(f"Camera with ID {camera_id} cannot be opened.")
+                    continue  # Skip this camera and move to the next one
+                self.workers[camera_id] = CameraWorker(self, settings, camera)
+                self.thresholds[camera_id] = settings['threshold']
+                self.enable_face_detection[camera_id] = settings['enable_face_detection']
+                self.enable_person_detection[camera_id] = settings['enable_person_detection']
+                self.enable_vehicle_detection[camera_id] = settings['enable_vehicle_detection']
+                self.enable_animal_detection[camera_id] = settings['enable_animal_detection']
+                self.enable_explosion_detection[camera_id] = settings['enable_explosion_detection']
+            except Exception as e:
+                logging.error(f"Error initializing camera {camera_id}: {e}")
+
+    def _detector_loaded(self, name, detector):
+        yolo = getattr(detector, 'engine', None)
+        if INFERENCE_BATCHING and yolo is not None and hasattr(yolo, 'enable_batching'):
+            yolo.enable_batching(INFERENCE_BATCH_SIZE, INFERENCE_MAX_WAIT_MS)
+
+    def sync_detectors(self, camera_id):
+        """
+        Register camera_id as a user of the detectors it enables (loading them
+        in the background) and drop it from the ones it no longer does.
+        """
+        for name, enabled in self._enable_flags(camera_id):
+            if enabled:
+                self.detectors.acquire(name, camera_id)
+            else:
+                self.detectors.release(name, camera_id)
+
+    def start(self):
+        self.segment_index.start()
+        self.event_store.start()
+        self.retention.start()
+        self.detectors.start()
+        for camera_id, worker in self.workers.items():
+            self.sync_detectors(camera_id)
+            worker.start()
+        logging.info(f"NVR engine started with cameras {sorted(self.workers)}")
+
+    def stop(self):
+        if self._stopped:
+            return
+        self._stopped = True
+        for worker in self.workers.values():
+            worker.stop()
+        # Workers index their last segments on stop, so flush after them
+        self.segment_index.stop()
+        self.event_store.stop()
+        self.retention.stop()
+        self.detectors.stop()
+        if self.process_pool is not None:
+            self.process_pool.stop()
+        logging.info("NVR engine stopped")
+
+    def camera_ids(self):
+        return list(self.workers.keys())
+
+    def motion_status(self):
+        return {camera_id: worker.motion_detected for camera_id, worker in self.workers.items()}
+
+    def save_settings(self, camera_id):
+        worker = self.workers[camera_id]
+        save_camera_settings(
+            settings_path(self.settings_dir, camera_id),
+            camera_id,
+            self.thresholds[camera_id],
+            self.enable_face_detection[camera_id],
+            self.enable_person_detection[camera_id],
+            self.enable_vehicle_detection[camera_id],
+            self.enable_animal_detection[camera_id],
+            self.enable_explosion_detection[camera_id],
+            {key: worker.settings[key] for key in MOTION_KEYS + SOURCE_KEYS}
+        )
+
+    def get_broadcaster(self, camera_id):
+        worker = self.workers.get(camera_id)
+        if worker is None or not worker.camera.connected:
+            return None
+        return worker.broadcaster
+
+    def _enable_flags(self, camera_id):
+        return [
+            ('face', self.enable_face_detection.get(camera_id, False)),
+            ('person', self.enable_person_detection.get(camera_id, False)),
+            ('vehicle', self.enable_vehicle_detection.get(camera_id, False)),
+            ('animal', self.enable_animal_detection.get(camera_id, False)),
+            ('explosion', self.enable_explosion_detection.get(camera_id, False)),
+        ]
+
+    def enabled_detectors(self, camera_id):
+        """(name, detector) for every enabled detector that has finished loading."""
+        detectors = []
+        for name, enabled in self._enable_flags(camera_id):
+            if enabled:
+                detector = self.detectors.get(name)
+                if detector is not None:
+                    detectors.append((name, detector))
+        return detectors
+
+    def batch_server(self):
+        """The shared YOLO BatchInferenceServer, if a loaded detector started one."""
+        for detector in self.detectors.loaded():
+            server = getattr(getattr(detector, 'engine', None), 'batch_server', None)
+            if server is not None:
+                return server
+        return None
+
+    def health(self, max_frame_age=HEALTH_MAX_FRAME_AGE):
+        """
+        (healthy, per-camera report). A camera is healthy while its newest
+        captured frame is at most max_frame_age seconds old.
+        """
+        cameras = {}
+        for camera_id, worker in self.workers.items():
+            latest = worker.camera.latest()
+            age = time.time() - latest.timestamp if latest is not None else None
+            cameras[camera_id] = {
+                "healthy": age is not None and age <= max_frame_age,
+                "frame_age_seconds": age,
+                "fps": worker.fps,
+            }
+        healthy = bool(cameras) and all(camera["healthy"] for camera in cameras.values())
+        return healthy, cameras
+
+    def metrics_gauges(self):
+        """Scrape-time samples for /metrics: per-camera state plus process RSS and threads."""
+        gauges = process_gauges()
+        for camera_id, worker in self.workers.items():
+            gauges.append(("nvr_capture_fps", "Frames captured per second.", {"camera": camera_id}, worker.fps))
+            gauges.append(("nvr_stream_clients", "Connected MJPEG clients.", {"camera": camera_id}, worker.broadcaster.clients))
+            for consumer, subscriber in (("capture", worker.subscriber), ("record", worker.recorder.subscriber)):
+                gauges.append(("nvr_frames_missed_total", "Frames a consumer lost because the camera buffer wrapped.",
+                               {"camera": camera_id, "consumer": consumer}, subscriber.missed))
+            queues = [worker.motion_queue, worker.detect_queue, worker.recorder.queue, worker.broadcaster.input]
+            for queue in queues:
+                if queue is None:
+                    continue
+                labels = {"camera": camera_id, "queue": queue.name.split('-')[0]}
+                gauges.append(("nvr_queue_depth", "Items waiting in a stage queue.", labels, len(queue)))
+                gauges.append(("nvr_queue_dropped_frames_total", "Frames a stage queue has discarded.", labels, queue.dropped))
+        return gauges
+
+    def pipeline_stats(self):
+        return {camera_id: worker.stats() for camera_id, worker in self.workers.items()}
+
+    def detection_crops(self, camera_id, frame, regions=None):
+        """
+        (x, y, FrameContext) crops the heavy detectors should run on for this frame.
+
+        Without motion there is nothing to look at; with motion only padded
+        crops around the moving regions are searched, unless they cover most
+        of the frame anyway.
+        """
+        context = FrameContext.wrap(frame)
+        if not MOTION_GATING:
+            return [(0, 0, context)]
+        if regions is None:
+            worker = self.workers.get(camera_id)
+            regions = worker.motion_regions if worker is not None else []
+        if not regions:
+            return []
+        height, width = context.shape[:2]
+        padded = merge_regions([pad_region(r, ROI_PADDING, width, height) for r in regions])
+        if sum(w * h for _, _, w, h in padded) > ROI_MAX_AREA_FRACTION * width * height:
+            return [(0, 0, context)]
+        return [(x, y, FrameContext(context.image[y:y + h, x:x + w].copy())) for x, y, w, h in padded]
+
+    def detect_frame(self, camera_id, captured, regions=None, context=None):
+        """
+        Run every enabled detector on a captured frame, at most once per frame.
+
+        :param regions: motion regions of this frame; defaults to the camera's latest.
+        :param context: FrameContext of captured.image, if the caller already has one.
+        """
+        detectors = self.enabled_detectors(camera_id)
+        if not detectors:
+            return []
+        crops = None
+
+        def frame_crops():
+            # Built on the first cache miss only, and once for all detectors.
+            # No motion means no crops: due detectors see nothing and tracks age out
+            nonlocal crops
+            if crops is None:
+                crops = self.detection_crops(camera_id, context or captured.image, regions)
+            return crops
+
+        detections = []
+        for name, detector in detectors:
+            tracked = self.get_tracked_detector(camera_id, name)
+            run = lambda detector=detector, name=name: self._timed_detect(camera_id, name, detector, frame_crops(), captured)
+            detections.extend(self.detection_cache.get_or_compute(
+                camera_id, captured.seq, name,
+                lambda tracked=tracked, run=run: tracked.step(captured.timestamp, run, camera_id, captured.seq)))
+        return detections
+
+    def _timed_detect(self, camera_id, name, detector, crops, captured):
+        if not crops:
+            return []  # no motion: no model runs, so nothing to time or count
+        latency, calls = self.get_detector_metrics(camera_id, name)
+        started = time.monotonic()
+        detections = detect_in_crops(detector, crops, camera_id, captured.seq, captured.timestamp)
+        latency.observe(time.monotonic() - started)
+        calls.inc()
+        return detections
+
+    def get_tracked_detector(self, camera_id, name):
+        key = (camera_id, name)
+        with self._tracked_lock:
+            tracked = self.tracked_detectors.get(key)
+            if tracked is None:
+                tracked = TrackedDetector(TRACKER_DETECT_EVERY_N_FRAMES, TRACKER_DETECT_INTERVAL)
+                self.tracked_detectors[key] = tracked
+        return tracked
+
+    def get_detector_metrics(self, camera_id, name):
+        """(latency histogram, call counter) of one detector on one camera, looked up in REGISTRY once."""
+        key = (camera_id, name)
+        metrics = self.detector_metrics.get(key)
+        if metrics is None:
+            metrics = (
+                REGISTRY.histogram('nvr_detector_latency_seconds', 'Time per detector run over all crops of a frame.',
+                                   camera=camera_id, detector=name),
+                REGISTRY.counter('nvr_inference_calls_total', 'Detector runs (frames actually sent to a model).',
+                                 camera=camera_id, detector=name),
+            )
+            self.detector_metrics[key] = metrics
+        return metrics
+
+    def object_counts(self, camera_id):
+        counts = {}
+        # Detect threads add entries as cameras enable detectors
+        with self._tracked_lock:
+            tracked_detectors = list(self.tracked_detectors.items())
+        for (cam, _), tracked in tracked_detectors:
+            if cam == camera_id:
+                for label, count in tracked.tracker.counts().items():
+                    counts[label] = counts.get(label, 0) + count
+        return counts
+
+    def annotate_frame(self, camera_id, captured, detections=None):
+        if detections is None:
+            detections = self.detect_frame(camera_id, captured)
+        return self.overlay.draw(captured.image.copy(), detections)
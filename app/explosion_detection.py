@@ -1,6 +1,9 @@
 import cv2
 import torch
 import numpy as np
+from app.detection import Detection, OverlayRenderer
+from app.frame_context import FrameContext
+from app.yolo_engine import decode_outputs, class_threshold_table
 
 class CombinedDetector:
     def __init__(self, explosion_model_path='/home/risc3/new_nvring/NVRR/nvr1_project/yolov5/best.pt', 
@@ -31,99 +34,69 @@ class CombinedDetector:
         self.bird_class_ids = [14]
         self.ship_class_ids = [8]
 
-    def detect_explosions(self, frame):
+        object_style = ((225, 255, 255), 0.8)
+        self.renderer = OverlayRenderer(styles={label: object_style for label in ('Person', 'Animal', 'Car', 'Bird', 'Ship')},
+                                        show_confidence=True)
 
+        # Per-class thresholds for the vectorized decoder; classes outside the groups are dropped
+        self.class_thresholds = class_threshold_table(80, [
+            ([self.person_class_id], self.person_conf_threshold),
+            (self.animal_class_ids, self.animal_conf_threshold),
+            (self.car_class_ids, self.car_conf_threshold),
+            (self.bird_class_ids, self.bird_conf_threshold),
+            (self.ship_class_ids, self.ship_conf_threshold),
+        ])
 
-        img = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        results = self.explosion_model(img)
+    def detect_explosions(self, frame, camera_id=None, frame_seq=None, timestamp=None):
+        results = self.explosion_model(FrameContext.wrap(frame).rgb())
 
         detections = results.xyxy[0].numpy()  # Get the detections
 
+        explosions = []
         for det in detections:
             x1, y1, x2, y2, conf, cls = det
             label = self.explosion_model.names[int(cls)]
             if label == 'Explosion' and conf > self.explosion_conf_threshold:  # Check confidence threshold
-                # Draw bounding box around detected explosion
-                cv2.rectangle(frame, (int(x1), int(y1)), (int(x2), int(y2)), (0, 0, 255), 2)
-                cv2.putText(frame, f'{label} {conf:.2f}', (int(x1), int(y1) - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.9, (0, 0, 255), 2)
+                box = (int(x1), int(y1), int(x2) - int(x1), int(y2) - int(y1))
+                explosions.append(Detection(label, float(conf), box, camera_id, frame_seq, timestamp))
 
-        return frame
+        return explosions
 
-    def detect_objects(self, frame):
-
-        blob = cv2.dnn.blobFromImage(frame, 1/255.0, (416, 416), swapRB=True, crop=False)
-        self.yolov3_net.setInput(blob)
+    def detect_objects(self, frame, camera_id=None, frame_seq=None, timestamp=None):
+        context = FrameContext.wrap(frame)
+        self.yolov3_net.setInput(context.blob(1 / 255.0, (416, 416)))
         outputs = self.yolov3_net.forward(self.yolov3_output_layers)
 
-        h, w = frame.shape[:2]
-        boxes = []
-        confidences = []
-        class_ids = []
-
-        for output in outputs:
-            for detection in output:
-                scores = detection[5:]
-                class_id = np.argmax(scores)
-                confidence = scores[class_id]
-
-                # Check confidence against the respective thresholds and valid class IDs
-                if (class_id == self.person_class_id and confidence > self.person_conf_threshold) or \
-                (class_id in self.animal_class_ids and confidence > self.animal_conf_threshold) or \
-                (class_id in self.car_class_ids and confidence > self.car_conf_threshold) or \
-                (class_id in self.bird_class_ids and confidence > self.bird_conf_threshold) or \
-                (class_id in self.ship_class_ids and confidence > self.ship_conf_threshold):
-                    box = detection[0:4] * np.array([w, h, w, h])
-                    (centerX, centerY, width, height) = box.astype("int")
-                    x = int(centerX - (width / 2))
-                    y = int(centerY - (height / 2))
-
-                    boxes.append([x, y, int(width), int(height)])
-                    confidences.append(float(confidence))
-                    class_ids.append(class_id)
+        h, w = context.shape[:2]
+        class_ids, confidences, boxes = decode_outputs(outputs, w, h, class_thresholds=self.class_thresholds)
+        boxes = boxes.tolist()
+        confidences = confidences.tolist()
+        class_ids = class_ids.tolist()
 
         indices = cv2.dnn.NMSBoxes(boxes, confidences, min(self.person_conf_threshold, self.animal_conf_threshold, self.car_conf_threshold, self.bird_conf_threshold, self.ship_conf_threshold), 0.4)
 
-        if len(indices) > 0:
-            for i in indices.flatten():
-                x, y, w, h = boxes[i]
-                conf_percent = int(confidences[i] * 100)  # Convert confidence to percentage
-
-                if class_ids[i] == self.person_class_id:
-                    label = f"Person {conf_percent}%"
-                    color = (225, 255, 255)
-                elif class_ids[i] in self.animal_class_ids:
-                    label = f"Animal {conf_percent}%"
-                    color = (225, 255, 255)
-                elif class_ids[i] in self.car_class_ids:
-                    label = f"Car {conf_percent}%"
-                    color = (225, 255, 255)
-                elif class_ids[i] in self.bird_class_ids:
-                    label = f"Bird {conf_percent}%"
-                    color = (225, 255, 255)
-                elif class_ids[i] in self.ship_class_ids:
-                    label = f"Ship {conf_percent}%"
-                    color = (225, 255, 255)
-
-                # Draw the bounding box
-                cv2.rectangle(frame, (x, y), (x + w, y + h), color, 2)
-
-                # Put the label above the rectangle with a smaller font and blue color
-                font_scale = 0.8  # Smaller font scale, less than 10
-                thickness = 2
-                text_size = cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, font_scale, thickness)[0]
-                text_x = x
-                text_y = y - 5  # Position the text above the rectangle
-                if text_y < 0:
-                    text_y = y + text_size[1] + 5  # If text is outside the frame, position it inside
-                cv2.putText(frame, label, (text_x, text_y), cv2.FONT_HERSHEY_SIMPLEX, font_scale, (255, 0, 0), thickness)  # Blue color
-
-        return frame
-
+        objects = []
+        for i in np.array(indices).flatten():
+            if class_ids[i] == self.person_class_id:
+                label = "Person"
+            elif class_ids[i] in self.animal_class_ids:
+                label = "Animal"
+            elif class_ids[i] in self.car_class_ids:
+                label = "Car"
+            elif class_ids[i] in self.bird_class_ids:
+                label = "Bird"
+            else:
+                label = "Ship"
+            objects.append(Detection(label, confidences[i], tuple(boxes[i]), camera_id, frame_seq, timestamp))
+
+        return objects
+
+    def detect(self, frame, camera_id=None, frame_seq=None, timestamp=None):
+        return (self.detect_explosions(frame, camera_id, frame_seq, timestamp) +
+                self.detect_objects(frame, camera_id, frame_seq, timestamp))
 
     def detect_and_draw(self, frame):
-  
-        frame = self.detect_explosions(frame)
-        frame = self.detect_objects(frame)
-        return frame
-
+        return self.renderer.draw(frame, self.detect(frame))
 
+# app.main_window refers to the combined model as the explosion detector
+ExplosionDetector = CombinedDetector
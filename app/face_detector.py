@@ -1,28 +1,33 @@
 # app/face_detector.py
 
-import cv2
 import mediapipe as mp
+from app.detection import Detection, OverlayRenderer
+from app.frame_context import FrameContext
 
 class FaceDetector:
     def __init__(self):
         self.mp_face_detection = mp.solutions.face_detection
         self.face_detection = self.mp_face_detection.FaceDetection(min_detection_confidence=0.5)
+        self.renderer = OverlayRenderer()
 
-    def detect_and_draw(self, frame):
-        frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        results = self.face_detection.process(frame_rgb)
+    def detect(self, frame, camera_id=None, frame_seq=None, timestamp=None):
+        context = FrameContext.wrap(frame)
+        results = self.face_detection.process(context.rgb())
 
+        detections = []
         if results.detections:
-            h, w, _ = frame.shape
+            h, w, _ = context.shape
             for detection in results.detections:
                 bboxC = detection.location_data.relative_bounding_box
                 x_min = int(bboxC.xmin * w)
                 y_min = int(bboxC.ymin * h)
-                x_max = x_min + int(bboxC.width * w)
-                y_max = y_min + int(bboxC.height * h)
-                
-                cv2.rectangle(frame, (x_min, y_min), (x_max, y_max), (0, 255, 0), 2)
-                cv2.putText(frame, 'Face', (x_min, y_min - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.9, (0, 255, 0), 2)
+                box = (x_min, y_min, int(bboxC.width * w), int(bboxC.height * h))
+                detections.append(Detection('Face', float(detection.score[0]), box, camera_id, frame_seq, timestamp))
+
+        return detections
 
-        return frame
+    def close(self):
+        self.face_detection.close()
 
+    def detect_and_draw(self, frame):
+        return self.renderer.draw(frame, self.detect(frame))
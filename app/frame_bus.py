@@ -0,0 +1,169 @@
+# app/frame_bus.py
+#
+# Raw frames of a camera published into shared memory, so other processes on
+# the host (viewers, recorders, analytics) can read them without capturing,
+# decoding or going through the MJPEG stream again.
+#
+# Layout of the segment nvr_cam<id>:
+#
+#     header (64 bytes): magic, version, slot count, slot size, last seq
+#     slot 0:  slot header (64 bytes): seq_begin, seq_end, timestamp,
+#                                      height, width, channels
+#              image bytes (slot_bytes)
+#     slot 1:  ...
+#
+# Frame seq goes to slot seq % slots. The writer zeroes seq_end, sets
+# seq_begin, copies the image, then sets seq_end; a reader trusts a slot only
+# while seq_begin == seq_end == the seq it expects.
+
+import struct
+import time
+from multiprocessing import shared_memory
+import numpy as np
+
+MAGIC = b'NVRB'
+VERSION = 1
+HEADER = struct.Struct('<4sIIQQ')
+SLOT_HEADER = struct.Struct('<QQdIII')
+HEADER_SIZE = 64
+SLOT_HEADER_SIZE = 64
+LAST_SEQ_OFFSET = 20
+
+def segment_name(camera_id):
+    return f"nvr_cam{camera_id}"
+
+def attach_shared_memory(name):
+    """Attach to an existing segment without this process's resource tracker unlinking it at exit."""
+    shm = shared_memory.SharedMemory(name=name)
+    try:
+        from multiprocessing import resource_tracker
+        resource_tracker.unregister(shm._name, 'shared_memory')
+    except Exception:
+        pass
+    return shm
+
+class BusFrame:
+    """A frame mapped straight out of the bus; image is a read-only view, not a copy."""
+    __slots__ = ('seq', 'timestamp', 'image', '_reader', '_offset')
+
+    def __init__(self, seq, timestamp, image, reader, offset):
+        self.seq = seq
+        self.timestamp = timestamp
+        self.image = image
+        self._reader = reader
+        self._offset = offset
+
+    def valid(self):
+        """False once the publisher has started overwriting this slot; check after using image."""
+        begin, end = struct.unpack_from('<QQ', self._reader.shm.buf, self._offset)
+        return begin == end == self.seq
+
+    def copy(self):
+        return BusFrame(self.seq, self.timestamp, self.image.copy(), self._reader, self._offset)
+
+class FrameBusPublisher:
+    """
+    Owner side of a camera's frame bus. The segment is created on the first
+    publish(), sized for that frame, and unlinked by close().
+    """
+    def __init__(self, camera_id, slots=8, name=None):
+        self.camera_id = camera_id
+        self.slots = slots
+        self.name = name or segment_name(camera_id)
+        self.shm = None
+        self.slot_bytes = 0
+        self.published = 0
+
+    def _create(self, nbytes):
+        try:
+            # Left behind by a publisher that died without close()
+            stale = shared_memory.SharedMemory(name=self.name)
+            stale.close()
+            stale.unlink()
+        except FileNotFoundError:
+            pass
+        self.slot_bytes = nbytes
+        self.shm = shared_memory.SharedMemory(name=self.name, create=True,
+                                              size=HEADER_SIZE + self.slots * (SLOT_HEADER_SIZE + nbytes))
+        HEADER.pack_into(self.shm.buf, 0, MAGIC, VERSION, self.slots, nbytes, 0)
+
+    def publish(self, captured):
+        image = captured.image
+        if self.shm is None:
+            self._create(image.nbytes)
+        elif image.nbytes > self.slot_bytes:
+            raise ValueError(f"{image.nbytes}-byte frame does not fit the {self.slot_bytes}-byte slots of {self.name}")
+
+        buf = self.shm.buf
+        offset = HEADER_SIZE + (captured.seq % self.slots) * (SLOT_HEADER_SIZE + self.slot_bytes)
+        struct.pack_into('<Q', buf, offset + 8, 0)
+        struct.pack_into('<Q', buf, offset, captured.seq)
+        height, width = image.shape[:2]
+        channels = image.shape[2] if image.ndim == 3 else 1
+        np.ndarray(image.shape, dtype=np.uint8, buffer=buf, offset=offset + SLOT_HEADER_SIZE)[...] = image
+        SLOT_HEADER.pack_into(buf, offset, captured.seq, 0, captured.timestamp, height, width, channels)
+        struct.pack_into('<Q', buf, offset + 8, captured.seq)
+        struct.pack_into('<Q', buf, LAST_SEQ_OFFSET, captured.seq)
+        self.published += 1
+
+    def close(self):
+        if self.shm is not None:
+            self.shm.close()
+            self.shm.unlink()
+            self.shm = None
+
+class FrameBusReader:
+    """
+    Consumer side, from any process on the host. Like app.camera.FrameSubscriber
+    it remembers the last seq handed out, so each frame is seen at most once.
+    """
+    def __init__(self, camera_id, name=None):
+        self.name = name or segment_name(camera_id)
+        self.shm = attach_shared_memory(self.name)
+        magic, version, self.slots, self.slot_bytes, _ = HEADER.unpack_from(self.shm.buf, 0)
+        if magic != MAGIC or version != VERSION:
+            self.shm.close()
+            raise ValueError(f"{self.name} is not a version {VERSION} frame bus")
+        self.last_seq = 0
+
+    def _last_published(self):
+        return struct.unpack_from('<Q', self.shm.buf, LAST_SEQ_OFFSET)[0]
+
+    def _read(self, seq):
+        offset = HEADER_SIZE + (seq % self.slots) * (SLOT_HEADER_SIZE + self.slot_bytes)
+        begin, end, timestamp, height, width, channels = SLOT_HEADER.unpack_from(self.shm.buf, offset)
+        if not begin == end == seq:
+            return None  # being rewritten, or already lapped
+        shape = (height, width, channels) if channels > 1 else (height, width)
+        image = np.ndarray(shape, dtype=np.uint8, buffer=self.shm.buf, offset=offset + SLOT_HEADER_SIZE)
+        image.flags.writeable = False
+        return BusFrame(seq, timestamp, image, self, offset)
+
+    def latest(self):
+        seq = self._last_published()
+        return self._read(seq) if seq else None
+
+    def poll(self):
+        """Return the newest frame not yet seen, or None without blocking."""
+        seq = self._last_published()
+        if seq <= self.last_seq:
+            return None
+        frame = self._read(seq)
+        if frame is not None:
+            self.last_seq = seq
+        return frame
+
+    def next(self, timeout=None, poll_interval=0.002):
+        """Wait (by polling; there is no cross-process wakeup) for a frame newer than the last one seen."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            frame = self.poll()
+            if frame is not None:
+                return frame
+            if deadline is not None and time.monotonic() >= deadline:
+                return None
+            time.sleep(poll_interval)
+
+    def close(self):
+        # Fails while BusFrame images from this reader are still referenced
+        self.shm.close()
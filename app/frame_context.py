@@ -0,0 +1,67 @@
+# app/frame_context.py
+
+import threading
+import cv2
+
+class FrameContext:
+    """
+    Derived forms of one BGR image, each computed at most once.
+
+    Every detector that looks at the same frame (or crop) should be handed
+    the same context, so the RGB conversion, grayscale, motion working frame
+    and DNN blobs are shared instead of recomputed per detector. Results are
+    treated as read-only by all consumers.
+    """
+    __slots__ = ('image', '_cache', '_lock')
+
+    def __init__(self, image):
+        self.image = image
+        self._cache = {}
+        self._lock = threading.RLock()  # motion_frame() may reuse gray()
+
+    @classmethod
+    def wrap(cls, frame):
+        """Return frame if it is already a context, else a new context around the image."""
+        return frame if isinstance(frame, cls) else cls(frame)
+
+    @property
+    def shape(self):
+        return self.image.shape
+
+    def _memo(self, key, compute):
+        # Held while computing, so two detectors asking at once still convert once
+        with self._lock:
+            value = self._cache.get(key)
+            if value is None:
+                value = compute()
+                self._cache[key] = value
+            return value
+
+    def rgb(self):
+        return self._memo('rgb', lambda: cv2.cvtColor(self.image, cv2.COLOR_BGR2RGB))
+
+    def gray(self):
+        return self._memo('gray', lambda: cv2.cvtColor(self.image, cv2.COLOR_BGR2GRAY))
+
+    def motion_frame(self, working_width=None, grayscale=False):
+        """
+        Downsampled (and optionally grayscale) frame for motion detection.
+
+        :return: (working_frame, scale) where scale maps full-frame to working coordinates.
+        """
+        def compute():
+            width = self.image.shape[1]
+            scale = working_width / width if working_width and width > working_width else 1.0
+            small = self.image
+            if scale != 1.0:
+                small = cv2.resize(small, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+            if grayscale:
+                # Resize first: converting the small frame is cheaper
+                small = self.gray() if small is self.image else cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+            return small, scale
+        return self._memo(('motion', working_width, grayscale), compute)
+
+    def blob(self, scale, size, swap_rb=True, mean=(0, 0, 0)):
+        """cv2.dnn.blobFromImage of the image, memoized by its parameters."""
+        return self._memo(('blob', scale, tuple(size), swap_rb, tuple(mean)),
+                          lambda: cv2.dnn.blobFromImage(self.image, scale, tuple(size), mean, swap_rb, crop=False))
@@ -0,0 +1,134 @@
+# app/inference_server.py
+
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+import numpy as np
+
+class InferenceStats:
+    def __init__(self, max_batch_size):
+        self.max_batch_size = max_batch_size
+        self.batches = 0
+        self.frames = 0
+        self.queue_latency_total = 0.0
+        self.queue_latency_max = 0.0
+        self.forward_time_total = 0.0
+
+    def snapshot(self):
+        batches = self.batches or 1
+        frames = self.frames or 1
+        return {
+            "batches": self.batches,
+            "frames": self.frames,
+            "avg_batch_size": self.frames / batches,
+            "batch_fill": self.frames / (batches * self.max_batch_size),
+            "avg_queue_latency_ms": self.queue_latency_total / frames * 1000.0,
+            "max_queue_latency_ms": self.queue_latency_max * 1000.0,
+            "avg_forward_ms": self.forward_time_total / batches * 1000.0,
+        }
+
+class BatchInferenceServer:
+    """
+    Collects blobs submitted from every camera for up to max_wait_ms and
+    runs them through the network as one batch.
+
+    submit() takes a single-image blob (1, C, H, W), as built by
+    FrameContext.blob(), and returns a Future resolving to that frame's list of output layer
+    arrays, in the same form net.forward() gives for a single image, so
+    callers decode results exactly as they would without batching.
+    """
+    def __init__(self, net, output_layers, max_batch_size=8, max_wait_ms=5):
+        self.net = net
+        self.output_layers = output_layers
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+
+        self.stats = InferenceStats(max_batch_size)
+        self._queue = queue.Queue()
+        self._running = True
+        self._thread = threading.Thread(target=self._serve, name="batch-inference", daemon=True)
+        self._thread.start()
+
+    def submit(self, blob):
+        future = Future()
+        if not self._running:
+            future.set_exception(RuntimeError("Batch inference server is stopped"))
+            return future
+        self._queue.put((blob, future, time.monotonic()))
+        return future
+
+    def infer(self, blob, timeout=None):
+        return self.submit(blob).result(timeout)
+
+    def stop(self):
+        self._running = False
+        self._queue.put(None)
+        self._thread.join(timeout=2)
+        # Blobs queued behind the sentinel would otherwise never get an answer
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not None:
+                item[1].set_exception(RuntimeError("Batch inference server stopped"))
+
+    def _collect(self):
+        first = self._queue.get()
+        if first is None:
+            return []
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is None:
+                self._running = False
+                break
+            batch.append(item)
+        return batch
+
+    def _serve(self):
+        while self._running:
+            batch = self._collect()
+            if not batch:
+                continue
+
+            started = time.monotonic()
+            for _, _, submitted in batch:
+                latency = started - submitted
+                self.stats.queue_latency_total += latency
+                self.stats.queue_latency_max = max(self.stats.queue_latency_max, latency)
+
+            try:
+                # Same array blobFromImages would build, from blobs the callers already made
+                blob = np.concatenate([blob for blob, _, _ in batch]) if len(batch) > 1 else batch[0][0]
+                self.net.setInput(blob)
+                outs = self.net.forward(self.output_layers)
+            except Exception as e:
+                logging.error(f"Batched inference failed for {len(batch)} frames: {e}")
+                for _, future, _ in batch:
+                    future.set_exception(e)
+                continue
+
+            self.stats.batches += 1
+            self.stats.frames += len(batch)
+            self.stats.forward_time_total += time.monotonic() - started
+
+            for index, (_, future, _) in enumerate(batch):
+                future.set_result([self._split(out, index, len(batch)) for out in outs])
+
+    @staticmethod
+    def _split(out, index, batch_size):
+        out = np.asarray(out)
+        if out.ndim == 3:
+            return out[index]
+        # Darknet region layers stack every image's rows into one 2D array
+        return out.reshape(batch_size, -1, out.shape[-1])[index]
@@ -0,0 +1,124 @@
+# app/metrics.py
+#
+# Minimal Prometheus text-format metrics. Histograms and counters are created
+# once and then only incremented, without locks or allocation, so they can
+# stay on in production; gauges are sampled at scrape time instead.
+
+import bisect
+import os
+import resource
+import threading
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{value}"' for key, value in labels) + "}"
+
+class Counter:
+    def __init__(self, labels):
+        self.labels = labels
+        self.value = 0
+
+    def inc(self, amount=1):
+        self.value += amount
+
+    def samples(self, name):
+        yield f"{name}{_format_labels(self.labels)} {self.value}"
+
+class Histogram:
+    """
+    Fixed-bucket histogram. observe() is unlocked: a concurrent observe from
+    two threads can lose a count, which is fine for latency metrics.
+    """
+    def __init__(self, labels, buckets=DEFAULT_BUCKETS):
+        self.labels = labels
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def samples(self, name):
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            yield f"{name}_bucket{_format_labels(self.labels + (('le', repr(bound)),))} {cumulative}"
+        yield f"{name}_bucket{_format_labels(self.labels + (('le', '+Inf'),))} {self.count}"
+        yield f"{name}_sum{_format_labels(self.labels)} {self.sum}"
+        yield f"{name}_count{_format_labels(self.labels)} {self.count}"
+
+class MetricsRegistry:
+    def __init__(self):
+        self._families = {}  # name -> (type, help, {labels: metric})
+        self._lock = threading.Lock()
+
+    def _get(self, kind, name, help, labels, factory):
+        labels = tuple(sorted((key, str(value)) for key, value in labels.items()))
+        family = self._families.get(name)
+        metric = family[2].get(labels) if family is not None else None
+        if metric is None:
+            with self._lock:
+                family = self._families.setdefault(name, (kind, help, {}))
+                metric = family[2].setdefault(labels, factory(labels))
+        return metric
+
+    def counter(self, name, help, **labels):
+        return self._get('counter', name, help, labels, Counter)
+
+    def histogram(self, name, help, buckets=DEFAULT_BUCKETS, **labels):
+        return self._get('histogram', name, help, labels, lambda labels: Histogram(labels, buckets))
+
+    def render(self, gauges=()):
+        """
+        Text exposition of every metric, plus gauges given as
+        (name, help, labels dict, value) tuples sampled by the caller. Sampled
+        values named *_total are exposed as counters.
+        """
+        lines = []
+        with self._lock:
+            families = list(self._families.items())
+        for name, (kind, help, metrics) in sorted(families):
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} {kind}")
+            for metric in list(metrics.values()):
+                lines.extend(metric.samples(name))
+
+        seen = set()
+        # Samples of one family must be contiguous
+        for name, help, labels, value in sorted(gauges, key=lambda gauge: gauge[0]):
+            if value is None:
+                continue
+            if name not in seen:
+                seen.add(name)
+                lines.append(f"# HELP {name} {help}")
+                lines.append(f"# TYPE {name} {'counter' if name.endswith('_total') else 'gauge'}")
+            lines.append(f"{name}{_format_labels(tuple(sorted((k, str(v)) for k, v in labels.items())))} {value}")
+        return "\n".join(lines) + "\n"
+
+REGISTRY = MetricsRegistry()
+
+def process_gauges():
+    """RSS and thread counts of this process."""
+    rss = None
+    native_threads = None
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    rss = int(line.split()[1]) * 1024
+                elif line.startswith('Threads:'):
+                    native_threads = int(line.split()[1])
+    except OSError:
+        # Not Linux: peak rather than current RSS (kilobytes on Linux/BSD, bytes on macOS)
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * (1 if os.uname().sysname == 'Darwin' else 1024)
+    return [
+        ("process_resident_memory_bytes", "Resident set size.", {}, rss),
+        ("process_threads", "OS threads, including native library pools.", {}, native_threads),
+        ("process_python_threads", "Live Python threads.", {}, threading.active_count()),
+    ]
@@ -0,0 +1,231 @@
+# app/model_registry.py
+#
+# Detector modules pull in mediapipe, torch and the YOLO weights at import
+# time, so they are imported by name here, only once a camera enables them.
+
+import importlib
+import logging
+import queue
+import threading
+import time
+from app.process_pool import ProcessDetector
+from config import PERSON_DETECTOR
+
+# name -> (module, class, pool size). None means one instance shared by every
+# thread; a size means the backend is not thread-safe and callers check out
+# one of up to that many instances per call.
+DETECTOR_CLASSES = {
+    'face': ('app.face_detector', 'FaceDetector', 2),
+    'person': ('app.person_detector', 'YoloPersonDetector', None) if PERSON_DETECTOR == 'yolo'
+              else ('app.person_detector', 'PersonDetector', 2),
+    'vehicle': ('app.vehicle_detector', 'VehicleDetector', None),
+    'animal': ('app.animal_detector', 'AnimalDetector', None),
+    'explosion': ('app.explosion_detection', 'ExplosionDetector', 2),
+}
+
+LOADING = 'loading'
+READY = 'ready'
+FAILED = 'failed'
+
+def _close(detector):
+    close = getattr(detector, 'close', None)
+    if close is not None:
+        try:
+            close()
+        except Exception as e:
+            logging.error(f"Error closing {type(detector).__name__}: {e}")
+
+class ModelPool:
+    """
+    Up to size instances of a detector that must not be used by two threads
+    at once. detect() checks one out for the call; instances beyond the first
+    are built in the background the first time every existing one is busy.
+    """
+    def __init__(self, name, factory, first, size):
+        self.name = name
+        self.factory = factory
+        self.size = size
+        self.instances = 1
+
+        self._idle = queue.Queue()
+        self._idle.put(first)
+        self._lock = threading.Lock()
+        self._building = False
+        self._closed = False
+
+    def _grow(self):
+        try:
+            instance = self.factory()
+        except Exception as e:
+            logging.error(f"Could not add a {self.name} instance to its pool: {e}")
+        else:
+            with self._lock:
+                self.instances += 1
+            self._return(instance)
+        finally:
+            with self._lock:
+                self._building = False
+
+    def _checkout(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if not self._building and self.instances < self.size:
+                self._building = True
+                threading.Thread(target=self._grow, name=f"load-{self.name}", daemon=True).start()
+        return self._idle.get()
+
+    def detect(self, frame, camera_id=None, frame_seq=None, timestamp=None):
+        instance = self._checkout()
+        try:
+            return instance.detect(frame, camera_id, frame_seq, timestamp)
+        finally:
+            self._return(instance)
+
+    def _return(self, instance):
+        with self._lock:
+            if not self._closed:
+                self._idle.put(instance)
+                return
+        # Checked out (or still being built) when the pool was closed
+        _close(instance)
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+        while True:
+            try:
+                _close(self._idle.get_nowait())
+            except queue.Empty:
+                break
+
+class ModelRegistry:
+    """
+    Process-wide detectors, loaded once however many cameras use them.
+
+    Cameras acquire() the detectors they enable and release() the ones they
+    disable; loading runs on a background thread, and get() never blocks, so
+    the pipeline keeps running (without that detector) while a model loads.
+    A detector nobody has used for idle_timeout seconds is unloaded and
+    reloaded on next use. With a process_pool, detectors run in its worker
+    processes and get() hands out ProcessDetector proxies. A detector that fails to load is logged once and
+    stays unavailable.
+    """
+    def __init__(self, idle_timeout=300.0, on_load=None, check_interval=30.0, process_pool=None):
+        self.idle_timeout = idle_timeout
+        self.on_load = on_load
+        self.process_pool = process_pool
+        self.check_interval = check_interval
+        self.load_times = {}
+
+        self._models = {}
+        self._states = {}
+        self._users = {name: set() for name in DETECTOR_CLASSES}
+        self._idle_since = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self.idle_timeout:
+            self._thread = threading.Thread(target=self._run, name="model-registry", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def acquire(self, name, user):
+        """Register user (e.g. a camera id) of name and start loading it if needed."""
+        with self._lock:
+            self._users[name].add(user)
+            self._idle_since.pop(name, None)
+        self._ensure_loading(name)
+
+    def release(self, name, user):
+        with self._lock:
+            users = self._users[name]
+            users.discard(user)
+            if not users:
+                self._idle_since.setdefault(name, time.monotonic())
+
+    def get(self, name):
+        """The loaded detector (or its pool), or None while it loads."""
+        model = self._models.get(name)
+        if model is None:
+            self._ensure_loading(name)
+        return model
+
+    def _ensure_loading(self, name):
+        with self._lock:
+            if name in self._states:
+                return
+            self._states[name] = LOADING
+        threading.Thread(target=self._load, args=(name,), name=f"load-{name}", daemon=True).start()
+
+    def _factory(self, name):
+        if self.process_pool is not None:
+            # Loads in every worker; the proxy itself is safe to share between threads
+            return lambda: ProcessDetector(self.process_pool, name)
+        module_name, class_name, _ = DETECTOR_CLASSES[name]
+
+        def build():
+            detector = getattr(importlib.import_module(module_name), class_name)()
+            if self.on_load is not None:
+                self.on_load(name, detector)
+            return detector
+        return build
+
+    def _load(self, name):
+        factory = self._factory(name)
+        pool_size = DETECTOR_CLASSES[name][2] if self.process_pool is None else None
+        started = time.monotonic()
+        try:
+            detector = factory()
+        except Exception as e:
+            logging.error(f"{name} detector unavailable: {e}")
+            with self._lock:
+                self._states[name] = FAILED
+            return
+
+        model = ModelPool(name, factory, detector, pool_size) if pool_size else detector
+        self.load_times[name] = time.monotonic() - started
+        logging.info(f"Loaded {name} detector in {self.load_times[name]:.1f}s")
+        with self._lock:
+            self._models[name] = model
+            self._states[name] = READY
+            if not self._users[name]:
+                self._idle_since.setdefault(name, time.monotonic())
+
+    def _run(self):
+        while not self._stop.wait(self.check_interval):
+            self.unload_idle()
+
+    def unload_idle(self):
+        now = time.monotonic()
+        unloaded = []
+        with self._lock:
+            for name, since in list(self._idle_since.items()):
+                if now - since >= self.idle_timeout and self._states.get(name) == READY:
+                    unloaded.append((name, self._models.pop(name)))
+                    del self._states[name]
+                    del self._idle_since[name]
+        for name, model in unloaded:
+            _close(model)
+            logging.info(f"Unloaded {name} detector after {self.idle_timeout:.0f}s unused")
+
+    def loaded(self):
+        return list(self._models.values())
+
+    def status(self):
+        with self._lock:
+            return {name: {
+                "state": state,
+                "users": sorted(self._users[name]),
+                "instances": getattr(self._models.get(name), 'instances', 1) if state == READY else 0,
+                "load_seconds": self.load_times.get(name),
+            } for name, state in self._states.items()}
@@ -1,34 +1,61 @@
 # app/person_detector.py
 
-import cv2
 import mediapipe as mp
+from app.detection import Detection, OverlayRenderer
+from app.frame_context import FrameContext
+from app.yolo_engine import YoloEngineDetector, PERSON_CLASSES
 
 class PersonDetector:
     def __init__(self):
         self.mp_pose = mp.solutions.pose
         self.pose = self.mp_pose.Pose()
+        self.renderer = OverlayRenderer()
+
+    def detect(self, frame, camera_id=None, frame_seq=None, timestamp=None):
+        context = FrameContext.wrap(frame)
+        results = self.pose.process(context.rgb())
+
+        if not results.pose_landmarks:
+            return []
+
+        h, w, _ = context.shape
+        x_min, y_min = w, h
+        x_max, y_max = 0, 0
+        visibility = 0.0
+
+        landmarks = results.pose_landmarks.landmark
+        for landmark in landmarks:
+            x, y = int(landmark.x * w), int(landmark.y * h)
+            if x < x_min:
+                x_min = x
+            if y < y_min:
+                y_min = y
+            if x > x_max:
+                x_max = x
+            if y > y_max:
+                y_max = y
+            visibility += landmark.visibility
+
+        # Pose has no detection score; mean landmark visibility stands in for it
+        confidence = visibility / len(landmarks)
+        return [Detection('Person', confidence, (x_min, y_min, x_max - x_min, y_max - y_min), camera_id, frame_seq, timestamp)]
+
+    def close(self):
+        self.pose.close()
+
+    def detect_and_draw(self, frame):
+        return self.renderer.draw(frame, self.detect(frame))
+
+class YoloPersonDetector(YoloEngineDetector):
+    """Person boxes from the shared COCO engine, for cameras that already run YOLO."""
+    def __init__(self, engine=None, conf_threshold=0.5):
+        super(YoloPersonDetector, self).__init__(engine)
+        self.conf_threshold = conf_threshold
+        self.renderer = OverlayRenderer()
+
+    def detect(self, frame, camera_id=None, frame_seq=None, timestamp=None):
+        return [Detection('Person', confidence, tuple(box), camera_id, frame_seq, timestamp)
+                for class_id, confidence, box in self.engine.detect_classes(frame, PERSON_CLASSES, self.conf_threshold)]
 
     def detect_and_draw(self, frame):
-        frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        results = self.pose.process(frame_rgb)
-
-        if results.pose_landmarks:
-            h, w, _ = frame.shape
-            x_min, y_min = w, h
-            x_max, y_max = 0, 0
-
-            for landmark in results.pose_landmarks.landmark:
-                x, y = int(landmark.x * w), int(landmark.y * h)
-                if x < x_min:
-                    x_min = x
-                if y < y_min:
-                    y_min = y
-                if x > x_max:
-                    x_max = x
-                if y > y_max:
-                    y_max = y
-
-            cv2.rectangle(frame, (x_min, y_min), (x_max, y_max), (0, 255, 0), 2)
-            cv2.putText(frame, 'Person', (x_min, y_min - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.9, (0, 255, 0), 2)
-
-        return frame
+        return self.renderer.draw(frame, self.detect(frame))
@@ -0,0 +1,131 @@
+# app/pipeline.py
+
+import logging
+import threading
+import time
+from collections import deque
+
+BLOCK = 'block'
+DROP_OLDEST = 'drop_oldest'
+KEEP_LATEST = 'keep_latest'
+
+class StageQueue:
+    """
+    Bounded queue between two pipeline stages.
+
+    Policies when full:
+      block        put() waits for room (for stages that must not lose frames)
+      drop_oldest  the oldest queued item is discarded to make room
+      keep_latest  everything queued is discarded; only the newest item is kept
+    """
+    def __init__(self, name, maxsize, policy=DROP_OLDEST):
+        if policy not in (BLOCK, DROP_OLDEST, KEEP_LATEST):
+            raise ValueError(f"Unknown queue policy: {policy}")
+        self.name = name
+        self.maxsize = maxsize
+        self.policy = policy
+        self.put_count = 0
+        self.dropped = 0
+        self.high_water = 0
+
+        self._items = deque()
+        self._closed = False
+        self._condition = threading.Condition()
+
+    def put(self, item, timeout=None):
+        """Queue item; returns False only if a blocking put timed out or the queue is closed."""
+        with self._condition:
+            if self._closed:
+                return False
+            if self.policy == KEEP_LATEST:
+                self.dropped += len(self._items)
+                self._items.clear()
+            elif len(self._items) >= self.maxsize:
+                if self.policy == DROP_OLDEST:
+                    self._items.popleft()
+                    self.dropped += 1
+                elif not self._condition.wait_for(lambda: len(self._items) < self.maxsize or self._closed, timeout):
+                    self.dropped += 1
+                    return False
+                elif self._closed:
+                    return False
+            self._items.append(item)
+            self.put_count += 1
+            self.high_water = max(self.high_water, len(self._items))
+            self._condition.notify_all()
+            return True
+
+    def get(self, timeout=None):
+        """Next item, or None on timeout or once the queue is closed and empty."""
+        with self._condition:
+            self._condition.wait_for(lambda: self._items or self._closed, timeout)
+            if not self._items:
+                return None
+            item = self._items.popleft()
+            self._condition.notify_all()
+            return item
+
+    def close(self):
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+
+    def __len__(self):
+        return len(self._items)
+
+    def stats(self):
+        return {
+            "depth": len(self._items),
+            "maxsize": self.maxsize,
+            "policy": self.policy,
+            "put": self.put_count,
+            "dropped": self.dropped,
+            "high_water": self.high_water,
+        }
+
+class Stage:
+    """
+    A thread applying handler(item) to everything arriving on its input queue.
+
+    :param latency: optional app.metrics Histogram observing each handler call.
+    """
+    def __init__(self, name, input_queue, handler, latency=None):
+        self.name = name
+        self.input_queue = input_queue
+        self.handler = handler
+        self.latency = latency
+        self.processed = 0
+        self.busy_time = 0.0
+
+        self._running = False
+        self._thread = None
+
+    def start(self):
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=5):
+        self._running = False
+        self.input_queue.close()
+        if self._thread is not None:
+            self._thread.join(timeout=timeout)
+            self._thread = None
+
+    def _run(self):
+        while self._running or len(self.input_queue):
+            item = self.input_queue.get(timeout=0.5)
+            if item is None:
+                if not self._running:
+                    break
+                continue
+            started = time.monotonic()
+            try:
+                self.handler(item)
+            except Exception as e:
+                logging.error(f"Stage {self.name} failed: {e}")
+            elapsed = time.monotonic() - started
+            self.busy_time += elapsed
+            self.processed += 1
+            if self.latency is not None:
+                self.latency.observe(elapsed)
@@ -0,0 +1,293 @@
+# app/process_pool.py
+#
+# Detectors running in worker processes, so MediaPipe post-processing, YOLO
+# decoding and the rest of the Python-side work are not serialised on the
+# engine's GIL. Frames travel through shared memory; only small task and
+# result tuples are pickled.
+
+import importlib
+import itertools
+import logging
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from multiprocessing import shared_memory
+import numpy as np
+from app.detection import Detection
+from app.frame_bus import attach_shared_memory
+
+def _worker_main(index, tasks, results, detector_classes, cpus, cv2_threads):
+    if cpus and hasattr(os, 'sched_setaffinity'):
+        try:
+            os.sched_setaffinity(0, cpus)
+        except OSError as e:
+            logging.error(f"Inference worker {index} could not pin to CPUs {sorted(cpus)}: {e}")
+    import cv2
+    cv2.setNumThreads(cv2_threads)
+
+    detectors = {}
+    segments = {}
+    while True:
+        task = tasks.get()
+        if task is None:
+            break
+        task_id, op, name, slot, shape, dtype, camera_id, frame_seq, timestamp = task
+        try:
+            if op == 'unload':
+                detector = detectors.pop(name, None)
+                if detector is not None and hasattr(detector, 'close'):
+                    detector.close()
+                results.put((task_id, index, None, None))
+                continue
+            detector = detectors.get(name)
+            if detector is None:
+                module_name, class_name = detector_classes[name][:2]
+                detector = getattr(importlib.import_module(module_name), class_name)()
+                detectors[name] = detector
+            if op == 'load':
+                results.put((task_id, index, None, None))
+                continue
+            shm = segments.get(slot)
+            if shm is None:
+                shm = segments[slot] = attach_shared_memory(slot)
+                # Slots only ever grow, so smaller ones have been (or soon will be) replaced
+                for stale in [other for other, segment in segments.items() if segment.size < shm.size]:
+                    segments.pop(stale).close()
+            frame = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+            found = [(d.label, float(d.confidence), tuple(int(v) for v in d.bbox))
+                     for d in detector.detect(frame, camera_id, frame_seq, timestamp)]
+            del frame
+            results.put((task_id, index, found, None))
+        except Exception as e:
+            results.put((task_id, index, None, f"{type(e).__name__}: {e}"))
+
+    for shm in segments.values():
+        shm.close()
+
+class ProcessInferencePool:
+    """
+    size worker processes, each loading its own copy of the detectors it is
+    asked to run.
+
+    Frames are copied once into one of a fixed number of shared memory slots
+    and the worker reads them in place. Slots start at slot_bytes and are
+    reallocated, as they come free, to fit the largest frame seen. Tasks go
+    to the worker with the fewest in flight. cpus is a list of CPU sets, one per
+    worker (cycled if shorter); cv2_threads caps OpenCV's own thread pool in
+    each worker so size workers do not oversubscribe the cores.
+
+    A worker that dies (a native crash in a model, say) fails the tasks it
+    had in flight, gives their slots back and is respawned with the
+    detectors that were loaded.
+    """
+    def __init__(self, detector_classes, size=2, cpus=None, cv2_threads=1, slots=None, slot_bytes=8 * 1024 ** 2,
+                 check_interval=0.5):
+        self.detector_classes = detector_classes
+        self.size = size
+        self.cpus = cpus
+        self.cv2_threads = cv2_threads
+        self.slot_bytes = slot_bytes
+        self.check_interval = check_interval
+        self.tasks_done = 0
+        self.restarts = 0
+
+        self._context = multiprocessing.get_context('spawn')
+        self._results = self._context.Queue()
+        self._task_queues = [None] * size
+        self._processes = [None] * size
+        self._in_flight = [0] * size
+        for index in range(size):
+            self._task_queues[index], self._processes[index] = self._start_worker(index)
+
+        self._segments = [shared_memory.SharedMemory(create=True, size=slot_bytes) for _ in range(slots or size * 2)]
+        self._free = queue.Queue()
+        for shm in self._segments:
+            self._free.put(shm)
+
+        self._futures = {}  # task id -> (future, shm, worker)
+        self._loaded = set()
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+        self._running = True
+        self._collector = threading.Thread(target=self._collect, name="inference-results", daemon=True)
+        self._collector.start()
+
+    def _start_worker(self, index):
+        worker_cpus = set(self.cpus[index % len(self.cpus)]) if self.cpus else None
+        tasks = self._context.Queue()
+        process = self._context.Process(target=_worker_main, name=f"inference-{index}",
+                                        args=(index, tasks, self._results, self.detector_classes, worker_cpus,
+                                              self.cv2_threads),
+                                        daemon=True)
+        process.start()
+        return tasks, process
+
+    def _dispatch(self, task, shm, future, worker=None):
+        with self._lock:
+            if worker is None:
+                worker = min(range(self.size), key=self._in_flight.__getitem__)
+            self._in_flight[worker] += 1
+            self._futures[task[0]] = (future, shm, worker)
+            tasks = self._task_queues[worker]
+        tasks.put(task)
+
+    def _broadcast(self, op, name, workers=None):
+        futures = []
+        for worker in range(self.size) if workers is None else workers:
+            future = Future()
+            self._dispatch((next(self._ids), op, name, None, None, None, None, None, None), None, future, worker)
+            futures.append(future)
+        return futures
+
+    def warm_up(self, name):
+        """Load name in every worker ahead of its first frame; returns the futures."""
+        with self._lock:
+            self._loaded.add(name)
+        return self._broadcast('load', name)
+
+    def unload(self, name):
+        with self._lock:
+            self._loaded.discard(name)
+        return self._broadcast('unload', name)
+
+    def submit(self, name, image, camera_id=None, frame_seq=None, timestamp=None, timeout=None):
+        """
+        Run detector name on image in a worker; returns a Future of [(label, confidence, bbox)].
+
+        :param timeout: seconds to wait for a free shared memory slot before raising TimeoutError.
+        """
+        if image.nbytes > self.slot_bytes:
+            with self._lock:
+                if image.nbytes > self.slot_bytes:
+                    logging.warning(f"Growing inference shared memory slots from {self.slot_bytes} to "
+                                    f"{image.nbytes} bytes for {image.shape} frames")
+                    self.slot_bytes = image.nbytes
+        try:
+            shm = self._free.get(timeout=timeout)
+        except queue.Empty:
+            raise TimeoutError(f"No free shared memory slot for {name} within {timeout}s")
+        if shm.size < image.nbytes:
+            shm = self._grow_segment(shm)
+        np.ndarray(image.shape, dtype=image.dtype, buffer=shm.buf)[...] = image
+        future = Future()
+        self._dispatch((next(self._ids), 'detect', name, shm.name, image.shape, image.dtype.str, camera_id, frame_seq, timestamp),
+                       shm, future)
+        return future
+
+    def _grow_segment(self, shm):
+        """Swap a free slot for one of the current slot_bytes."""
+        try:
+            replacement = shared_memory.SharedMemory(create=True, size=self.slot_bytes)
+        except Exception:
+            self._free.put(shm)
+            raise
+        with self._lock:
+            self._segments[self._segments.index(shm)] = replacement
+        shm.close()
+        shm.unlink()
+        return replacement
+
+    def _finish(self, task_id, found, error):
+        with self._lock:
+            entry = self._futures.pop(task_id, None)
+            if entry is None:
+                return  # already failed when its worker died
+            future, shm, worker = entry
+            self._in_flight[worker] -= 1
+        if shm is not None:
+            self._free.put(shm)
+        self.tasks_done += 1
+        if error is not None:
+            future.set_exception(RuntimeError(error))
+        else:
+            future.set_result(found)
+
+    def _reap(self):
+        """Fail the tasks of dead workers and respawn them."""
+        for index, process in enumerate(self._processes):
+            if process.is_alive():
+                continue
+            tasks, replacement = self._start_worker(index)
+            with self._lock:
+                # Anything dispatched from here on goes to the new queue
+                self._task_queues[index] = tasks
+                self._processes[index] = replacement
+                lost = [task_id for task_id, (_, _, worker) in self._futures.items() if worker == index]
+                loaded = set(self._loaded)
+            self.restarts += 1
+            logging.error(f"Inference worker {index} died (exit code {process.exitcode}) with {len(lost)} "
+                          f"tasks in flight; restarted it")
+            for task_id in lost:
+                self._finish(task_id, None, f"inference worker {index} died")
+            for name in loaded:
+                self._broadcast('load', name, [index])
+
+    def _collect(self):
+        next_check = time.monotonic() + self.check_interval
+        while self._running:
+            try:
+                task_id, _, found, error = self._results.get(timeout=self.check_interval)
+            except queue.Empty:
+                pass
+            else:
+                self._finish(task_id, found, error)
+            if time.monotonic() >= next_check and self._running:
+                self._reap()
+                next_check = time.monotonic() + self.check_interval
+
+    def stats(self):
+        with self._lock:
+            return {
+                "workers": self.size,
+                "alive": sum(process.is_alive() for process in self._processes),
+                "restarts": self.restarts,
+                "in_flight": list(self._in_flight),
+                "tasks_done": self.tasks_done,
+                "free_slots": self._free.qsize(),
+            }
+
+    def stop(self):
+        # Collector first, so no worker is respawned while they shut down
+        self._running = False
+        self._collector.join(timeout=2)
+        for tasks in self._task_queues:
+            tasks.put(None)
+        for process in self._processes:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+        with self._lock:
+            pending, self._futures = self._futures, {}
+        for future, _, _ in pending.values():
+            future.set_exception(RuntimeError("inference pool stopped"))
+        for shm in self._segments:
+            shm.close()
+            shm.unlink()
+
+class ProcessDetector:
+    """
+    Stands in for a detector of the given name, running it in the pool.
+    Construction blocks until every worker has loaded it, and raises if any
+    could not, so the model registry reports the detector as failed.
+    """
+    def __init__(self, pool, name, timeout=30.0, load_timeout=300.0):
+        self.pool = pool
+        self.name = name
+        self.timeout = timeout
+        try:
+            for future in pool.warm_up(name):
+                future.result(load_timeout)
+        except Exception:
+            pool.unload(name)
+            raise
+
+    def detect(self, frame, camera_id=None, frame_seq=None, timestamp=None):
+        image = getattr(frame, 'image', frame)  # FrameContext or plain image
+        found = self.pool.submit(self.name, image, camera_id, frame_seq, timestamp, self.timeout).result(self.timeout)
+        return [Detection(label, confidence, bbox, camera_id, frame_seq, timestamp) for label, confidence, bbox in found]
+
+    def close(self):
+        self.pool.unload(self.name)
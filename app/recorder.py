@@ -1,26 +1,262 @@
 # app/recorder.py
 
+import logging
+import os
+import threading
+import time
+from collections import deque
 import cv2
-from datetime import datetime
+from app.camera import CapturedFrame
+from app.pipeline import StageQueue, BLOCK
 
 class Recorder:
-    def __init__(self, camera):
+    """
+    Records a camera from its own subscriber on the frame buffer.
+
+    A feeder thread moves frames from the camera buffer into a blocking
+    queue and a writer thread writes them, so neither a slow disk nor a full
+    queue ever holds up the capture thread; if the queue stays full long
+    enough for the camera buffer to wrap, the skipped frames are counted in
+    subscriber.missed. The writer is opened lazily with the real frame size, and the
+    frame rate is measured from the timestamps of the first fps_probe_frames
+    frames rather than assumed.
+
+    With output_dir set, files are named by start time under
+    output_dir/cam<id>/; segment_seconds additionally splits output into
+    files of that length. on_segment(camera_id, path, start_time,
+    end_time, frame_count, byte_size, kind) is called as each one is closed.
+    """
+    def __init__(self, camera, queue_size=240, fps_probe_frames=30, fourcc='XVID',
+                 segment_seconds=None, output_dir=None, on_segment=None):
         self.camera = camera
+        self.segment_seconds = segment_seconds
+        self.output_dir = output_dir
+        self.on_segment = on_segment
+        self.segment_kind = 'segment'
+        self.filename_prefix = ''
+        self.subscriber = camera.subscribe()
+        self.queue_size = queue_size
+        self.fps_probe_frames = fps_probe_frames
+        self.fourcc = cv2.VideoWriter_fourcc(*fourcc)
+
         self.out = None
+        self.output_filename = None
         self.is_recording = False
+        self.fps = None
+        self.frame_size = None
+        self.frames_written = 0
+        self.segment_start = None
+        self.segment_end = None
+        self.segment_frames = 0
+        self.lag = 0.0  # seconds between capture and write of the last frame
+        self.max_lag = 0.0
+        self.write_latency = None  # optional app.metrics Histogram of VideoWriter.write time
+
+        self.queue = None
+        self._thread = None
+        self._feed_thread = None
+        self._pending = []
 
-    def start_recording(self, output_filename):
-        fourcc = cv2.VideoWriter_fourcc(*'XVID')
-        self.out = cv2.VideoWriter(output_filename, fourcc, 20.0, (640, 480))
+    def start_recording(self, output_filename=None):
+        self.output_filename = output_filename
+        self.queue = StageQueue(f"record-{self.camera.camera_id}", self.queue_size, BLOCK)
         self.is_recording = True
+        self._thread = threading.Thread(target=self._write_loop, name=f"recorder-{self.camera.camera_id}", daemon=True)
+        self._thread.start()
+        self._feed_thread = threading.Thread(target=self._feed_loop, name=f"record-feed-{self.camera.camera_id}", daemon=True)
+        self._feed_thread.start()
+
+    def submit(self, captured, timeout=1.0):
+        """Queue a CapturedFrame for writing; blocks (up to timeout) while the writer catches up."""
+        if self.is_recording:
+            self.queue.put(captured, timeout)
+
+    def _feed_loop(self):
+        while self.is_recording:
+            for captured in self.subscriber.next_batch(timeout=0.5):
+                self.submit(captured)
+
+    def _segment_path(self, start_time):
+        directory = os.path.join(self.output_dir, f"cam{self.camera.camera_id}")
+        os.makedirs(directory, exist_ok=True)
+        return os.path.join(directory, self.filename_prefix + time.strftime("%Y%m%d-%H%M%S", time.localtime(start_time)) + ".avi")
+
+    def _open_writer(self, frames):
+        if self.fps is None:
+            height, width = frames[0].image.shape[:2]
+            self.frame_size = (width, height)
+            elapsed = frames[-1].timestamp - frames[0].timestamp
+            self.fps = (len(frames) - 1) / elapsed if len(frames) > 1 and elapsed > 0 else 20.0
+        if self.output_dir is not None:
+            self.output_filename = self._segment_path(frames[0].timestamp)
+        self.segment_start = frames[0].timestamp
+        self.segment_frames = 0
+        self.out = cv2.VideoWriter(self.output_filename, self.fourcc, self.fps, self.frame_size)
+        logging.info(f"Recording camera {self.camera.camera_id} to {self.output_filename} at {self.frame_size[0]}x{self.frame_size[1]}, {self.fps:.1f} fps")
+
+    def _close_writer(self):
+        self.out.release()
+        self.out = None
+        if self.on_segment is not None and self.segment_frames:
+            try:
+                byte_size = os.path.getsize(self.output_filename)
+            except OSError:
+                byte_size = None
+            self.on_segment(self.camera.camera_id, self.output_filename, self.segment_start,
+                            self.segment_end, self.segment_frames, byte_size, self.segment_kind)
+
+    def _write(self, captured):
+        if self.segment_seconds and captured.timestamp - self.segment_start >= self.segment_seconds:
+            self._close_writer()
+            self._open_writer([captured])
+        started = time.monotonic()
+        self.out.write(captured.image)
+        if self.write_latency is not None:
+            self.write_latency.observe(time.monotonic() - started)
+        self.frames_written += 1
+        self.segment_frames += 1
+        self.segment_end = captured.timestamp
+        self.lag = time.time() - captured.timestamp
+        self.max_lag = max(self.max_lag, self.lag)
+
+    def _write_loop(self):
+        while True:
+            captured = self.queue.get(timeout=0.5)
+            if captured is None:
+                if not self.is_recording:
+                    break
+                continue
+            if self.out is None:
+                # Hold the first frames until the frame rate can be measured
+                self._pending.append(captured)
+                if len(self._pending) < self.fps_probe_frames:
+                    continue
+                self._flush_pending()
+            else:
+                self._write(captured)
+        if self._pending:
+            self._flush_pending()
+        if self.out is not None:
+            self._close_writer()
 
-    def record_frame(self):
-        if self.is_recording and self.camera.connected:
-            frame = self.camera.get_frame()
-            if frame is not None:
-                self.out.write(frame)
+    def _flush_pending(self):
+        self._open_writer(self._pending)
+        for pending in self._pending:
+            self._write(pending)
+        self._pending = []
 
     def stop_recording(self):
         if self.is_recording:
-            self.out.release()
             self.is_recording = False
+            self._feed_thread.join(timeout=5)
+            self._feed_thread = None
+            self.queue.close()
+            # The writer thread closes its own writer once the queue is drained
+            self._thread.join(timeout=10)
+            if self._thread.is_alive():
+                logging.warning(f"Recorder for camera {self.camera.camera_id} is still writing; it will close {self.output_filename} when done")
+            self._thread = None
+
+    def stats(self):
+        stats = self.queue.stats() if self.queue is not None else {}
+        stats.update({
+            "frames_written": self.frames_written,
+            "frames_missed": self.subscriber.missed,
+            "writer_lag_seconds": self.lag,
+            "max_writer_lag_seconds": self.max_lag,
+            "fps": self.fps,
+        })
+        return stats
+
+class EventRecorder(Recorder):
+    """
+    Records only around events. Frames are kept in a pre-roll ring buffer
+    bounded by pre_roll_seconds and max_pre_roll_bytes (optionally stored as
+    JPEG to save RAM). trigger() opens a clip that starts with the pre-roll
+    and continues until post_roll_seconds after the last trigger.
+
+    Each clip is reported through on_segment with kind 'event'.
+    """
+    def __init__(self, camera, queue_size=240, pre_roll_seconds=5.0, post_roll_seconds=10.0,
+                 max_pre_roll_bytes=64 * 1024 ** 2, compress_pre_roll=True, jpeg_quality=90,
+                 output_dir=None, on_segment=None, fourcc='XVID'):
+        super(EventRecorder, self).__init__(camera, queue_size, fourcc=fourcc, output_dir=output_dir, on_segment=on_segment)
+        self.segment_kind = 'event'
+        self.filename_prefix = 'event-'
+        self.pre_roll_seconds = pre_roll_seconds
+        self.post_roll_seconds = post_roll_seconds
+        self.max_pre_roll_bytes = max_pre_roll_bytes
+        self.compress_pre_roll = compress_pre_roll
+        self.encode_params = [int(cv2.IMWRITE_JPEG_QUALITY), jpeg_quality]
+
+        self.last_trigger = None
+        self.clips = 0
+        self._pre_roll = deque()
+        self._pre_roll_bytes = 0
+
+    def trigger(self, timestamp=None):
+        """Mark an event (motion or detection) at timestamp; safe to call from any thread."""
+        self.last_trigger = timestamp if timestamp is not None else time.time()
+
+    def _buffer(self, captured):
+        if self.compress_pre_roll:
+            ret, buffer = cv2.imencode('.jpg', captured.image, self.encode_params)
+            payload = buffer if ret else captured.image
+        else:
+            payload = captured.image
+        self._pre_roll.append((captured, payload))
+        self._pre_roll_bytes += payload.nbytes
+
+        while self._pre_roll and (captured.timestamp - self._pre_roll[0][0].timestamp > self.pre_roll_seconds
+                                  or self._pre_roll_bytes > self.max_pre_roll_bytes):
+            _, dropped = self._pre_roll.popleft()
+            self._pre_roll_bytes -= dropped.nbytes
+
+    def _take_pre_roll(self):
+        frames = []
+        for captured, payload in self._pre_roll:
+            if payload is not captured.image:
+                captured = CapturedFrame(captured.seq, captured.timestamp, cv2.imdecode(payload, cv2.IMREAD_COLOR))
+            frames.append(captured)
+        self._pre_roll.clear()
+        self._pre_roll_bytes = 0
+        return frames
+
+    def _handle(self, captured):
+        last_trigger = self.last_trigger
+        active = last_trigger is not None and captured.timestamp <= last_trigger + self.post_roll_seconds
+
+        if self.out is not None:
+            if active:
+                self._write(captured)
+                return
+            self._close_writer()
+
+        if active:
+            frames = self._take_pre_roll() + [captured]
+            self._open_writer(frames)
+            self.clips += 1
+            for frame in frames:
+                self._write(frame)
+        else:
+            self._buffer(captured)
+
+    def _write_loop(self):
+        while True:
+            captured = self.queue.get(timeout=0.5)
+            if captured is None:
+                if not self.is_recording:
+                    break
+                continue
+            self._handle(captured)
+        if self.out is not None:
+            self._close_writer()
+
+    def stats(self):
+        stats = super(EventRecorder, self).stats()
+        stats.update({
+            "clips": self.clips,
+            "pre_roll_frames": len(self._pre_roll),
+            "pre_roll_bytes": self._pre_roll_bytes,
+        })
+        return stats
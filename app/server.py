@@ -0,0 +1,150 @@
+# app/server.py
+
+import logging
+import time
+from flask import Flask, Response, jsonify, request
+from app.database import find_recordings, find_events
+from app.metrics import REGISTRY
+
+app = Flask(__name__)
+engine = None
+
+def init_server(nvr_engine):
+    global engine
+    engine = nvr_engine
+    return app
+
+def gen_frames(camera_id):
+    broadcaster = engine.get_broadcaster(camera_id)
+    if broadcaster is None:
+        logging.error(f"Camera {camera_id} is not connected or initialized.")
+        return
+    yield from broadcaster.stream()
+
+@app.route('/video_feed/<int:camera_id>')
+def video_feed(camera_id):
+    return Response(gen_frames(camera_id), mimetype='multipart/x-mixed-replace; boundary=frame')
+
+@app.route('/cameras', methods=['GET'])
+def list_cameras():
+    return jsonify(engine.camera_ids())
+
+@app.route('/motion_status', methods=['GET'])
+def motion_status():
+    try:
+        return jsonify(engine.motion_status())
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/config', methods=['POST'])
+def set_config():
+    data = request.get_json()
+    logging.debug(f"Received config data: {data}")
+    if not data:
+        return jsonify({"error": "No data received"}), 400
+
+    camera_id = data.get('camera_id')
+    if camera_id is None:
+        return jsonify({"error": "camera_id is required"}), 400
+
+    try:
+        camera_id = int(camera_id)
+        if camera_id not in engine.workers:
+            return jsonify({"error": f"Unknown camera {camera_id}"}), 404
+        engine.enable_face_detection[camera_id] = data.get('face_detection', False)
+        engine.enable_person_detection[camera_id] = data.get('person_detection', False)
+        engine.enable_vehicle_detection[camera_id] = data.get('vehicle_detection', False)
+        engine.enable_animal_detection[camera_id] = data.get('animal_detection', False)
+        engine.enable_explosion_detection[camera_id] = data.get('explosion_detection', engine.enable_explosion_detection[camera_id])
+        engine.save_settings(camera_id)
+        engine.sync_detectors(camera_id)
+        return jsonify({"status": "Configuration updated"})
+    except Exception as e:
+        logging.error(f"Error in set_config: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/get_config', methods=['GET'])
+def get_config():
+    camera_id = request.args.get('camera_id')
+    if not camera_id:
+        return jsonify({"error": "camera_id is required"}), 400
+
+    try:
+        camera_id = int(camera_id)
+        face_detection = 'ON' if engine.enable_face_detection[camera_id] else 'OFF'
+        person_detection = 'ON' if engine.enable_person_detection[camera_id] else 'OFF'
+        vehicle_detection = 'ON' if engine.enable_vehicle_detection[camera_id] else 'OFF'
+        animal_detection = 'ON' if engine.enable_animal_detection[camera_id] else 'OFF'
+        config_string = f"{face_detection}, {person_detection}, {vehicle_detection}, {animal_detection}"
+        return jsonify({"config": config_string})
+    except Exception as e:
+        logging.error(f"Error in get_config: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/object_counts/<int:camera_id>', methods=['GET'])
+def object_counts(camera_id):
+    return jsonify(engine.object_counts(camera_id))
+
+@app.route('/inference_stats', methods=['GET'])
+def inference_stats():
+    server = engine.batch_server()
+    if server is None:
+        stats = {"batching": False}
+    else:
+        stats = server.stats.snapshot()
+        stats["batching"] = True
+        stats["queue_depth"] = server._queue.qsize()
+    if engine.process_pool is not None:
+        stats["processes"] = engine.process_pool.stats()
+    return jsonify(stats)
+
+@app.route('/health', methods=['GET'])
+def health():
+    healthy, cameras = engine.health()
+    return jsonify({"status": "ok" if healthy else "unhealthy", "cameras": cameras}), 200 if healthy else 503
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    return Response(REGISTRY.render(engine.metrics_gauges()), mimetype='text/plain; version=0.0.4')
+
+@app.route('/pipeline_stats', methods=['GET'])
+def pipeline_stats():
+    return jsonify(engine.pipeline_stats())
+
+@app.route('/detectors', methods=['GET'])
+def detectors():
+    return jsonify(engine.detectors.status())
+
+@app.route('/recordings', methods=['GET'])
+def recordings():
+    try:
+        camera_id = int(request.args['camera_id'])
+        start = float(request.args.get('start', 0))
+        end = float(request.args.get('end', time.time()))
+    except (KeyError, ValueError):
+        return jsonify({"error": "camera_id is required; start and end are epoch seconds"}), 400
+    return jsonify(find_recordings(camera_id, start, end, engine.database))
+
+@app.route('/events', methods=['GET'])
+def events():
+    """
+    Stored detection/motion events, newest first.
+
+    Query parameters (all optional): camera_id, label, kind, start, end
+    (epoch seconds), min_confidence, limit (max 1000), offset.
+    """
+    args = request.args
+    try:
+        camera_id = int(args['camera_id']) if 'camera_id' in args else None
+        start = float(args['start']) if 'start' in args else None
+        end = float(args['end']) if 'end' in args else None
+        min_confidence = float(args['min_confidence']) if 'min_confidence' in args else None
+        limit = min(max(int(args.get('limit', 100)), 1), 1000)
+        offset = max(int(args.get('offset', 0)), 0)
+    except ValueError:
+        return jsonify({"error": "camera_id, limit and offset are integers; start, end and min_confidence are numbers"}), 400
+
+    found, total = find_events(camera_id, args.get('label'), args.get('kind'), start, end,
+                               min_confidence, limit, offset, engine.database)
+    next_offset = offset + len(found) if offset + len(found) < total else None
+    return jsonify({"events": found, "total": total, "limit": limit, "offset": offset, "next_offset": next_offset})
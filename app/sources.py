@@ -0,0 +1,178 @@
+# app/sources.py
+#
+# Where a Camera gets its frames from. Every source has the cv2.VideoCapture
+# methods Camera uses (isOpened, read, release), so a device, a network
+# stream, a looping recording and a synthetic scene are interchangeable.
+
+import logging
+import time
+import cv2
+import numpy as np
+
+URL_SCHEMES = ('rtsp://', 'rtsps://', 'http://', 'https://', 'rtmp://', 'udp://', 'tcp://')
+
+class Pacer:
+    """Sleeps so successive tick() calls are 1/fps apart, without drifting."""
+    def __init__(self, fps):
+        self.interval = 1.0 / fps if fps else 0.0
+        self._next = None
+
+    def tick(self):
+        if not self.interval:
+            return
+        now = time.monotonic()
+        if self._next is None or now - self._next > self.interval:
+            # First frame, or we fell more than a frame behind: restart the schedule
+            self._next = now
+        else:
+            time.sleep(max(0.0, self._next - now))
+        self._next += self.interval
+
+class StreamSource:
+    """RTSP/HTTP stream that reopens itself after reconnect_after consecutive failed reads."""
+    def __init__(self, url, reconnect_after=50):
+        self.url = url
+        self.reconnect_after = reconnect_after
+        self.capture = cv2.VideoCapture(url)
+        self._failures = 0
+
+    def isOpened(self):
+        return self.capture.isOpened()
+
+    def read(self):
+        ret, image = self.capture.read()
+        if ret:
+            self._failures = 0
+            return ret, image
+        self._failures += 1
+        if self._failures >= self.reconnect_after:
+            logging.warning(f"Reconnecting to {self.url}")
+            self.capture.release()
+            self.capture = cv2.VideoCapture(self.url)
+            self._failures = 0
+        return False, None
+
+    def release(self):
+        self.capture.release()
+
+class FileSource:
+    """
+    A recorded video played back in real time, at its own frame rate or a
+    forced fps, restarting from the beginning at the end when loop is set.
+    """
+    def __init__(self, path, fps=None, loop=True):
+        self.path = path
+        self.loop = loop
+        self.capture = cv2.VideoCapture(path)
+        native = self.capture.get(cv2.CAP_PROP_FPS) if self.capture.isOpened() else 0
+        self.fps = fps or native or 25.0
+        self.pacer = Pacer(self.fps)
+
+    def isOpened(self):
+        return self.capture.isOpened()
+
+    def read(self):
+        ret, image = self.capture.read()
+        if not ret and self.loop:
+            self.capture.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ret, image = self.capture.read()
+        if ret:
+            self.pacer.tick()
+        return ret, image
+
+    def release(self):
+        self.capture.release()
+
+class SyntheticSource:
+    """
+    Generated frames: a fixed noisy background with rectangles moving across
+    it and bouncing off the edges, for load tests without footage.
+
+    :param objects: list of dicts with size (w, h), position (x, y),
+                    velocity (vx, vy) in pixels per second and color (b, g, r).
+                    Defaults to three objects of different sizes and speeds.
+    """
+    def __init__(self, width=1280, height=720, fps=15.0, objects=None, seed=0):
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.pacer = Pacer(fps)
+        rng = np.random.default_rng(seed)
+        self.background = rng.integers(0, 60, (height, width, 3), dtype=np.uint8)
+        if objects is None:
+            objects = [
+                {"size": (width // 8, height // 4), "position": (0, height // 3), "velocity": (width / 6, 0), "color": (200, 200, 200)},
+                {"size": (width // 12, height // 10), "position": (width // 2, 0), "velocity": (width / 10, height / 5), "color": (40, 160, 220)},
+                {"size": (width // 20, height // 16), "position": (width // 4, height // 2), "velocity": (-width / 4, height / 8), "color": (60, 220, 60)},
+            ]
+        self.objects = [dict(obj, position=list(obj["position"]), velocity=list(obj["velocity"])) for obj in objects]
+        self._last = None
+        self._opened = True
+
+    def isOpened(self):
+        return self._opened
+
+    def _move(self, elapsed):
+        for obj in self.objects:
+            w, h = obj["size"]
+            for axis, limit in ((0, self.width - w), (1, self.height - h)):
+                obj["position"][axis] += obj["velocity"][axis] * elapsed
+                if not 0 <= obj["position"][axis] <= limit:
+                    obj["velocity"][axis] = -obj["velocity"][axis]
+                    obj["position"][axis] = min(max(obj["position"][axis], 0), limit)
+
+    def read(self):
+        if not self._opened:
+            return False, None
+        self.pacer.tick()
+        now = time.monotonic()
+        self._move(now - self._last if self._last is not None else 0.0)
+        self._last = now
+        frame = self.background.copy()
+        for obj in self.objects:
+            x, y = (int(v) for v in obj["position"])
+            w, h = obj["size"]
+            cv2.rectangle(frame, (x, y), (x + w, y + h), obj["color"], -1)
+        return True, frame
+
+    def release(self):
+        self._opened = False
+
+def open_source(spec, fps=None):
+    """
+    Open the frame source described by a camera's settings.
+
+    :param spec: int device index, or its digits as a string ('0', as
+                 --source passes it); a URL (rtsp://, http://, ...); a video
+                 file path (played in a loop); 'synthetic' or 'synthetic:<w>x<h>';
+                 or a dict with 'type' ('device', 'url', 'file', 'synthetic')
+                 and that source's keyword arguments.
+    :param fps: forced frame rate for file and synthetic sources.
+    """
+    if isinstance(spec, dict):
+        options = dict(spec)
+        kind = options.pop('type')
+        if fps and kind in ('file', 'synthetic'):
+            options.setdefault('fps', fps)
+        if kind == 'device':
+            return cv2.VideoCapture(options['index'])
+        if kind == 'url':
+            return StreamSource(**options)
+        if kind == 'file':
+            return FileSource(**options)
+        if kind == 'synthetic':
+            return SyntheticSource(**options)
+        raise ValueError(f"Unknown frame source type: {kind}")
+
+    if isinstance(spec, int):
+        return cv2.VideoCapture(spec)
+    if spec.isdigit():
+        return cv2.VideoCapture(int(spec))
+    if spec.startswith(URL_SCHEMES):
+        return StreamSource(spec)
+    if spec == 'synthetic' or spec.startswith('synthetic:'):
+        width, height = 1280, 720
+        if ':' in spec:
+            width, height = (int(v) for v in spec.split(':', 1)[1].split('x'))
+        return SyntheticSource(width, height, fps or 15.0)
+    return FileSource(spec, fps)
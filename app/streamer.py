@@ -0,0 +1,115 @@
+# app/streamer.py
+
+import logging
+import threading
+import time
+import cv2
+from app.pipeline import StageQueue, KEEP_LATEST
+
+class MJPEGBroadcaster:
+    """
+    Annotates and JPEG-encodes each camera frame once and hands the same
+    bytes to every connected /video_feed client.
+
+    The encoder thread only runs while at least one client is connected.
+    Clients never queue: a slow client simply picks up the newest packet the
+    next time it asks, skipping whatever it missed.
+
+    annotate(camera_id, captured_frame, detections) returns the image to
+    encode and must not modify captured_frame.image, which other consumers
+    share. detections is None for frames taken from the camera buffer.
+
+    By default frames are taken straight from the camera buffer. With
+    fed=True the owner pushes frames in with submit() instead (the pipeline
+    does this after detection, with that frame's detections), through a
+    keep-latest queue.
+    """
+    def __init__(self, camera, annotate=None, jpeg_quality=80, idle_timeout=5.0, fed=False, latency=None):
+        self.camera = camera
+        self.latency = latency  # optional app.metrics Histogram of annotate + encode time
+        self.input = StageQueue(f"encode-{camera.camera_id}", 1, KEEP_LATEST) if fed else None
+        self.annotate = annotate
+        self.encode_params = [int(cv2.IMWRITE_JPEG_QUALITY), jpeg_quality]
+        self.idle_timeout = idle_timeout
+
+        self.clients = 0
+        self.frames_encoded = 0
+        self._packet = None
+        self._packet_seq = 0
+        self._condition = threading.Condition()
+        self._thread = None
+
+    def _ensure_running(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._encode_loop, name=f"mjpeg-{self.camera.camera_id}", daemon=True)
+            self._thread.start()
+
+    def submit(self, captured, detections=None):
+        if self.input is not None and self.clients > 0:
+            self.input.put((captured, detections))
+
+    def _encode_loop(self):
+        subscriber = self.camera.subscribe() if self.input is None else None
+        while True:
+            with self._condition:
+                if self.clients == 0:
+                    self._condition.wait(self.idle_timeout)
+                    if self.clients == 0:
+                        # The next client must wait for a fresh frame, not see this one hours later
+                        self._packet = None
+                        self._packet_seq = 0
+                        self._thread = None
+                        return
+
+            detections = None
+            if subscriber is not None:
+                captured = subscriber.next(timeout=1.0)
+            else:
+                item = self.input.get(timeout=1.0)
+                captured, detections = item if item is not None else (None, None)
+            if captured is None:
+                continue
+
+            started = time.monotonic()
+            try:
+                if self.annotate is not None:
+                    frame = self.annotate(self.camera.camera_id, captured, detections)
+                else:
+                    frame = captured.image
+                ret, buffer = cv2.imencode('.jpg', frame, self.encode_params)
+                if not ret:
+                    logging.error(f"Failed to encode frame to JPEG for camera {self.camera.camera_id}.")
+                    continue
+            except Exception as e:
+                logging.error(f"Error encoding stream for camera {self.camera.camera_id}: {e}")
+                continue
+
+            if self.latency is not None:
+                self.latency.observe(time.monotonic() - started)
+            packet = (b'--frame\r\n'
+                      b'Content-Type: image/jpeg\r\n\r\n' + buffer.tobytes() + b'\r\n')
+            with self._condition:
+                self._packet = packet
+                self._packet_seq = captured.seq
+                self.frames_encoded += 1
+                self._condition.notify_all()
+
+    def stream(self):
+        """Generator of multipart MJPEG chunks for one client."""
+        with self._condition:
+            self.clients += 1
+            self._ensure_running()
+            self._condition.notify_all()
+        last_seq = 0
+        try:
+            while True:
+                with self._condition:
+                    self._condition.wait_for(lambda: self._packet_seq > last_seq, timeout=1.0)
+                    if self._packet_seq <= last_seq:
+                        continue
+                    packet = self._packet
+                    last_seq = self._packet_seq
+                yield packet
+        finally:
+            with self._condition:
+                self.clients -= 1
@@ -0,0 +1,217 @@
+# app/supervisor.py
+#
+# Runs one main.py per camera group and keeps it alive. Single-threaded on
+# purpose: processes are spawned from the loop thread only, which is what
+# makes pinning them with preexec_fn safe.
+
+import json
+import logging
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from app.camera_settings import load_all_camera_settings
+
+MAIN_SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'main.py')
+# main.py exits with this when none of its cameras could be opened; restarting will not help
+EXIT_NO_CAMERAS = 3
+
+def default_camera_groups(settings_dir):
+    return [[settings['camera_id']] for settings in load_all_camera_settings(settings_dir)]
+
+def spread_cpus(count):
+    """One CPU per worker, round-robin over the CPUs this process may use."""
+    available = sorted(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else list(range(os.cpu_count() or 1))
+    return [[available[i % len(available)]] for i in range(count)]
+
+def port_in_use(port):
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        return s.connect_ex(('localhost', port)) == 0
+
+class WorkerProcess:
+    """One supervised main.py and its restart bookkeeping."""
+    def __init__(self, camera_ids, port, cpus=None):
+        self.camera_ids = camera_ids
+        self.port = port
+        self.cpus = cpus
+        self.process = None
+        self.started_at = None
+        self.last_healthy = None
+        self.restarts = 0
+        self.backoff = 0.0
+        self.next_start = 0.0
+        self.next_probe = 0.0
+        self.disabled = False
+        # Set while a stalled worker is being stopped: (SIGKILL deadline, restart reason)
+        self.stopping = None
+
+    @property
+    def name(self):
+        return f"cameras {','.join(map(str, self.camera_ids))} on :{self.port}"
+
+    def command(self):
+        command = [sys.executable, MAIN_SCRIPT, '--port', str(self.port)]
+        for camera_id in self.camera_ids:
+            command += ['--camera_id', str(camera_id)]
+        return command
+
+    def running(self):
+        return self.process is not None and self.process.poll() is None
+
+    def start(self):
+        cpus = set(self.cpus) if self.cpus else None
+        pin = (lambda: os.sched_setaffinity(0, cpus)) if cpus and hasattr(os, 'sched_setaffinity') else None
+        self.process = subprocess.Popen(self.command(), preexec_fn=pin)
+        self.started_at = time.monotonic()
+        logging.info(f"Started worker for {self.name} (pid {self.process.pid}, cpus {sorted(cpus) if cpus else 'any'})")
+
+    def terminate(self):
+        # main.py stops its engine cleanly on SIGTERM
+        if self.running():
+            self.process.send_signal(signal.SIGTERM)
+
+    def wait(self, timeout):
+        """Wait for the process to exit, SIGKILLing it after timeout."""
+        if self.process is None:
+            return
+        try:
+            self.process.wait(timeout)
+        except subprocess.TimeoutExpired:
+            logging.error(f"Worker for {self.name} ignored SIGTERM for {timeout}s; killing it")
+            self.process.kill()
+            self.process.wait()
+
+    def probe(self, timeout):
+        """True if /health answers 200; unhealthy cameras are logged."""
+        try:
+            with urllib.request.urlopen(f"http://localhost:{self.port}/health", timeout=timeout) as response:
+                return response.status == 200
+        except urllib.error.HTTPError as e:
+            try:
+                report = json.loads(e.read().decode())
+                logging.warning(f"Worker for {self.name} unhealthy: {report.get('cameras')}")
+            except ValueError:
+                pass
+            return False
+        except (urllib.error.URLError, OSError):
+            return False
+
+    def status(self):
+        return {
+            "camera_ids": self.camera_ids,
+            "port": self.port,
+            "pid": self.process.pid if self.process is not None else None,
+            "running": self.running(),
+            "restarts": self.restarts,
+            "disabled": self.disabled,
+            "stopping": self.stopping is not None,
+            "cpus": self.cpus,
+        }
+
+class Supervisor:
+    """
+    Keeps one worker process per camera group running.
+
+    Workers that exit, or whose /health has failed for stall_seconds (after
+    startup_grace), are restarted after an exponential backoff that resets
+    once a worker has stayed up and healthy for backoff_max seconds. A worker
+    that exits with EXIT_NO_CAMERAS is a configuration error and is left
+    stopped. A port held by some other process is reported and retried,
+    never killed.
+    """
+    def __init__(self, camera_groups, base_port=5001, cpus=None, health_interval=5.0, health_timeout=2.0,
+                 startup_grace=30.0, stall_seconds=30.0, backoff_max=60.0, stop_timeout=10.0):
+        if cpus is None:
+            cpus = spread_cpus(len(camera_groups))
+        self.workers = [WorkerProcess(list(group), base_port + index, cpus[index % len(cpus)] if cpus else None)
+                        for index, group in enumerate(camera_groups)]
+        self.health_interval = health_interval
+        self.health_timeout = health_timeout
+        self.startup_grace = startup_grace
+        self.stall_seconds = stall_seconds
+        self.backoff_max = backoff_max
+        self.stop_timeout = stop_timeout
+        self._running = False
+
+    def _schedule_restart(self, worker, reason):
+        now = time.monotonic()
+        worker.backoff = min(self.backoff_max, worker.backoff * 2 if worker.backoff else 1.0)
+        worker.next_start = now + worker.backoff
+        worker.restarts += 1
+        logging.error(f"Worker for {worker.name} {reason}; restarting in {worker.backoff:.0f}s")
+
+    def _check(self, worker, now):
+        if worker.disabled:
+            return
+        if worker.stopping is not None:
+            # Never wait here: one hung worker must not hold up checks on the others
+            kill_at, reason = worker.stopping
+            if worker.running():
+                if now >= kill_at:
+                    logging.error(f"Worker for {worker.name} ignored SIGTERM for {self.stop_timeout}s; killing it")
+                    worker.process.kill()
+                    worker.stopping = (float('inf'), reason)
+                return
+            worker.process = None
+            worker.stopping = None
+            self._schedule_restart(worker, reason)
+            return
+        if worker.process is None or not worker.running():
+            if worker.process is not None:
+                code = worker.process.returncode
+                worker.process = None
+                if code == EXIT_NO_CAMERAS:
+                    worker.disabled = True
+                    logging.error(f"Worker for {worker.name} could not open any of its cameras; not restarting it")
+                    return
+                self._schedule_restart(worker, f"exited with code {code}")
+                return
+            if now < worker.next_start:
+                return
+            if port_in_use(worker.port):
+                logging.error(f"Port {worker.port} for {worker.name} is held by another process; retrying")
+                worker.next_start = now + self.health_interval
+                return
+            worker.start()
+            # Loading models and opening cameras counts as healthy for the grace period
+            worker.last_healthy = worker.next_probe = now + self.startup_grace
+            return
+
+        if now < worker.next_probe:
+            return
+        worker.next_probe = now + self.health_interval
+        if worker.probe(self.health_timeout):
+            worker.last_healthy = now
+            # Healthy for a full backoff period: the next failure starts from 1s again
+            if now - worker.started_at >= self.backoff_max:
+                worker.backoff = 0.0
+        elif now - worker.last_healthy >= self.stall_seconds:
+            worker.terminate()
+            worker.stopping = (now + self.stop_timeout, f"stalled (no healthy probe for {now - worker.last_healthy:.0f}s)")
+
+    def run(self):
+        self._running = True
+        logging.info(f"Supervising {len(self.workers)} workers: {', '.join(w.name for w in self.workers)}")
+        try:
+            while self._running:
+                now = time.monotonic()
+                for worker in self.workers:
+                    self._check(worker, now)
+                time.sleep(0.5)
+        finally:
+            self.stop_all()
+
+    def stop(self, *args):
+        self._running = False
+
+    def stop_all(self):
+        # Signal every worker first so they shut down in parallel
+        for worker in self.workers:
+            worker.terminate()
+        for worker in self.workers:
+            worker.wait(self.stop_timeout)
+        logging.info("All workers stopped")
@@ -0,0 +1,179 @@
+# app/tracker.py
+
+import itertools
+import threading
+from app.detection import Detection
+
+def iou(a, b):
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    ix = max(0, min(ax + aw, bx + bw) - max(ax, bx))
+    iy = max(0, min(ay + ah, by + bh) - max(ay, by))
+    inter = ix * iy
+    union = aw * ah + bw * bh - inter
+    return inter / union if union > 0 else 0.0
+
+def center_distance(a, b):
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    return ((ax + aw / 2 - bx - bw / 2) ** 2 + (ay + ah / 2 - by - bh / 2) ** 2) ** 0.5
+
+class Track:
+    """
+    One tracked object with an alpha-beta (steady-state Kalman) filter on
+    its box center and size, so it keeps moving between detector runs.
+    """
+    __slots__ = ('track_id', 'label', 'confidence', 'state', 'velocity', 'last_update', 'last_predict', 'hits', 'misses')
+
+    def __init__(self, track_id, detection, timestamp):
+        self.track_id = track_id
+        self.label = detection.label
+        self.confidence = detection.confidence
+        x, y, w, h = detection.bbox
+        self.state = [x + w / 2, y + h / 2, w, h]
+        self.velocity = [0.0, 0.0, 0.0, 0.0]
+        self.last_update = timestamp
+        self.last_predict = timestamp
+        self.hits = 1
+        self.misses = 0
+
+    @property
+    def bbox(self):
+        cx, cy, w, h = self.state
+        return (int(cx - w / 2), int(cy - h / 2), int(w), int(h))
+
+    def predict(self, timestamp):
+        dt = max(0.0, timestamp - self.last_predict)
+        if dt:
+            self.state = [s + v * dt for s, v in zip(self.state, self.velocity)]
+            self.state[2] = max(1.0, self.state[2])
+            self.state[3] = max(1.0, self.state[3])
+            self.last_predict = timestamp
+        return self.bbox
+
+    def correct(self, detection, timestamp, alpha=0.6, beta=0.2):
+        dt = max(1e-3, timestamp - self.last_update)
+        self.predict(timestamp)
+        x, y, w, h = detection.bbox
+        measured = [x + w / 2, y + h / 2, w, h]
+        for i in range(4):
+            residual = measured[i] - self.state[i]
+            self.state[i] += alpha * residual
+            self.velocity[i] += beta * residual / dt
+        self.label = detection.label
+        self.confidence = detection.confidence
+        self.last_update = timestamp
+        self.hits += 1
+        self.misses = 0
+
+class ObjectTracker:
+    """
+    Greedy IoU tracker with a centroid-distance fallback for small or fast objects.
+
+    update() feeds a fresh set of detections; predict() advances every track
+    to a new timestamp when the detector did not run. Both return Detection
+    records carrying a stable track_id.
+    """
+    def __init__(self, iou_threshold=0.3, max_center_distance=80, max_missed=3, max_age=2.0, min_hits=1):
+        self.iou_threshold = iou_threshold
+        self.max_center_distance = max_center_distance
+        self.max_missed = max_missed
+        self.max_age = max_age
+        self.min_hits = min_hits
+        self.tracks = []
+        self._ids = itertools.count(1)
+
+    def update(self, detections, timestamp):
+        for track in self.tracks:
+            track.predict(timestamp)
+
+        pairs = []
+        for ti, track in enumerate(self.tracks):
+            for di, detection in enumerate(detections):
+                if detection.label != track.label:
+                    continue
+                overlap = iou(track.bbox, detection.bbox)
+                if overlap >= self.iou_threshold:
+                    pairs.append((1.0 + overlap, ti, di))
+                else:
+                    distance = center_distance(track.bbox, detection.bbox)
+                    if distance <= self.max_center_distance:
+                        pairs.append((1.0 - distance / (self.max_center_distance + 1), ti, di))
+        pairs.sort(reverse=True)
+
+        matched_tracks, matched_detections = set(), set()
+        for _, ti, di in pairs:
+            if ti in matched_tracks or di in matched_detections:
+                continue
+            self.tracks[ti].correct(detections[di], timestamp)
+            matched_tracks.add(ti)
+            matched_detections.add(di)
+
+        for ti, track in enumerate(self.tracks):
+            if ti not in matched_tracks:
+                track.misses += 1
+        for di, detection in enumerate(detections):
+            if di not in matched_detections:
+                self.tracks.append(Track(next(self._ids), detection, timestamp))
+
+        self.tracks = [t for t in self.tracks if t.misses <= self.max_missed]
+        return self._report(timestamp)
+
+    def predict(self, timestamp):
+        for track in self.tracks:
+            track.predict(timestamp)
+        self.tracks = [t for t in self.tracks if timestamp - t.last_update <= self.max_age]
+        return self._report(timestamp)
+
+    def _report(self, timestamp):
+        return [Detection(t.label, t.confidence, t.bbox, timestamp=timestamp, track_id=t.track_id)
+                for t in self.tracks if t.hits >= self.min_hits]
+
+    def counts(self):
+        counts = {}
+        for track in self.tracks:
+            if track.hits >= self.min_hits:
+                counts[track.label] = counts.get(track.label, 0) + 1
+        return counts
+
+class TrackedDetector:
+    """
+    Schedules a detector to run every N frames and/or every interval seconds,
+    and lets an ObjectTracker carry its boxes through the frames in between.
+
+    every_n_frames of None, 0 or 1 means no frame-count schedule; with no
+    interval either, the detector runs on every frame.
+    """
+    def __init__(self, every_n_frames=5, interval=None, tracker=None):
+        self.every_n_frames = every_n_frames
+        self.interval = interval
+        self.tracker = tracker or ObjectTracker()
+        self._frames_since_run = None
+        self._last_run = None
+        self._lock = threading.Lock()
+
+    def due(self, timestamp):
+        if self._frames_since_run is None:
+            return True
+        if (not self.every_n_frames or self.every_n_frames <= 1) and self.interval is None:
+            return True
+        if self.every_n_frames and self._frames_since_run + 1 >= self.every_n_frames:
+            return True
+        if self.interval is not None and timestamp - self._last_run >= self.interval:
+            return True
+        return False
+
+    def step(self, timestamp, run_detector, camera_id=None, frame_seq=None):
+        """Run the detector if due, otherwise predict; returns tracked detections."""
+        with self._lock:
+            if self.due(timestamp):
+                self._frames_since_run = 0
+                self._last_run = timestamp
+                tracked = self.tracker.update(run_detector(), timestamp)
+            else:
+                self._frames_since_run += 1
+                tracked = self.tracker.predict(timestamp)
+        for detection in tracked:
+            detection.camera_id = camera_id
+            detection.frame_seq = frame_seq
+        return tracked
@@ -0,0 +1,222 @@
+# app/yolo_engine.py
+
+import os
+import threading
+import weakref
+from collections import deque
+import cv2
+import numpy as np
+from app.frame_context import FrameContext
+from app.inference_server import BatchInferenceServer
+
+YOLO_DIR = os.path.join(os.path.dirname(__file__), '..', 'yolo')
+DEFAULT_CONFIG = os.path.join(YOLO_DIR, 'yolov3-tiny.cfg')
+DEFAULT_WEIGHTS = os.path.join(YOLO_DIR, 'yolov3-tiny.weights')
+DEFAULT_NAMES = os.path.join(YOLO_DIR, 'coco.names')
+
+VEHICLE_CLASSES = ["car", "bus", "truck", "motorbike"]
+ANIMAL_CLASSES = ["cat", "dog", "horse", "sheep", "cow", "elephant", "bear", "zebra", "giraffe"]
+PERSON_CLASSES = ["person"]
+
+def class_threshold_table(num_classes, group_thresholds, default=np.inf):
+    """
+    Build a per-class confidence threshold array.
+
+    :param group_thresholds: iterable of (class_ids, threshold) pairs.
+    :param default: threshold for classes in no group; inf drops them.
+    """
+    table = np.full(num_classes, default, dtype=np.float32)
+    for class_ids, threshold in group_thresholds:
+        table[list(class_ids)] = threshold
+    return table
+
+def decode_outputs(outs, width, height, conf_threshold=0.5, class_thresholds=None):
+    """
+    Decode raw YOLO output layers with whole-array NumPy operations.
+
+    Rows are laid out as [cx, cy, w, h, objectness, class scores...] in
+    relative coordinates, as returned by cv2.dnn for Darknet models.
+
+    :param outs: list of output arrays from net.forward().
+    :param conf_threshold: scalar threshold used when class_thresholds is None.
+    :param class_thresholds: optional per-class threshold array (see class_threshold_table).
+    :return: (class_ids, confidences, boxes) arrays, boxes as int [x, y, w, h] rows.
+    """
+    rows = np.concatenate([np.asarray(out).reshape(-1, np.asarray(out).shape[-1]) for out in outs], axis=0)
+    scores = rows[:, 5:]
+
+    # Cheap max first so argmax only runs on the few rows that can pass any threshold
+    max_scores = scores.max(axis=1)
+    floor = conf_threshold if class_thresholds is None else class_thresholds.min()
+    candidates = np.flatnonzero(max_scores > floor)
+
+    class_ids = scores[candidates].argmax(axis=1)
+    confidences = max_scores[candidates]
+    if class_thresholds is None:
+        keep = confidences > conf_threshold
+    else:
+        keep = confidences > class_thresholds[class_ids]
+
+    rows = rows[candidates[keep]]
+    class_ids = class_ids[keep]
+    confidences = confidences[keep]
+
+    # Same truncation as the int() based loops this replaces
+    scale = np.array([width, height], dtype=np.float32)
+    centers = (rows[:, 0:2] * scale).astype(np.int32)
+    sizes = (rows[:, 2:4] * scale).astype(np.int32)
+    corners = (centers - sizes / 2).astype(np.int32)
+    boxes = np.hstack([corners, sizes])
+    return class_ids, confidences, boxes
+
+class YoloEngine:
+    """
+    One COCO detection network shared by every YOLO-based detector in the process.
+
+    detect() returns every class above min_confidence (before NMS) so that the
+    vehicle, animal and person views can each apply their own filter. Results
+    of the last few forward passes are kept, so several views asking about the
+    same frame object cost a single blobFromImage/forward.
+
+    shared() engines are reference counted: each caller release()s its
+    reference, and the last release frees the net and stops batching.
+    """
+    _instances = {}
+    _instances_lock = threading.Lock()
+
+    @classmethod
+    def shared(cls, config=DEFAULT_CONFIG, weights=DEFAULT_WEIGHTS, names=DEFAULT_NAMES, input_size=416):
+        key = (os.path.abspath(config), os.path.abspath(weights), input_size)
+        with cls._instances_lock:
+            engine = cls._instances.get(key)
+            if engine is None:
+                engine = cls(config, weights, names, input_size)
+                engine._key = key
+                cls._instances[key] = engine
+            engine._refs += 1
+            return engine
+
+    def release(self):
+        """Drop a reference taken with shared(); closes the engine when it was the last one."""
+        with YoloEngine._instances_lock:
+            self._refs -= 1
+            if self._refs > 0:
+                return
+            if YoloEngine._instances.get(self._key) is self:
+                del YoloEngine._instances[self._key]
+        self.close()
+
+    def close(self):
+        if self.batch_server is not None:
+            self.batch_server.stop()
+            self.batch_server = None
+        with self._lock:
+            self._recent.clear()
+        self.net = None
+
+    def __init__(self, config=DEFAULT_CONFIG, weights=DEFAULT_WEIGHTS, names=DEFAULT_NAMES, input_size=416, min_confidence=0.3):
+        self.net = cv2.dnn.readNet(weights, config)
+        self.layer_names = self.net.getLayerNames()
+        self.output_layers = [self.layer_names[i - 1] for i in np.array(self.net.getUnconnectedOutLayers()).flatten()]
+
+        with open(names, "r") as f:
+            self.classes = [line.strip() for line in f.readlines()]
+
+        self.input_size = input_size
+        self.min_confidence = min_confidence
+
+        self.batch_server = None
+        self.batch_timeout = 10.0
+
+        self._key = None
+        self._refs = 0
+        self._lock = threading.Lock()
+        self._net_lock = threading.Lock()
+        # (weakref to frame, detections) for the last few frames, matched by
+        # identity; one slot per camera is enough for all views of a frame to
+        # share a pass, and the weak reference lets old frames be freed
+        self._recent = deque(maxlen=16)
+
+    def enable_batching(self, max_batch_size=8, max_wait_ms=5, timeout=10.0):
+        """
+        Route forward passes from every camera through one BatchInferenceServer.
+
+        :param timeout: seconds forward() waits for its batch before raising.
+        """
+        self.batch_timeout = timeout
+        if self.batch_server is None:
+            self.batch_server = BatchInferenceServer(self.net, self.output_layers,
+                                                     max_batch_size=max_batch_size, max_wait_ms=max_wait_ms)
+        return self.batch_server
+
+    def class_ids(self, class_names):
+        return [i for i, name in enumerate(self.classes) if name in class_names]
+
+    def forward(self, frame):
+        # 1/255 scale, RGB: the same blob CombinedDetector builds, so a shared FrameContext makes it once
+        blob = FrameContext.wrap(frame).blob(1 / 255.0, (self.input_size, self.input_size))
+        batch_server = self.batch_server
+        if batch_server is not None:
+            return batch_server.infer(blob, self.batch_timeout)
+        with self._net_lock:
+            self.net.setInput(blob)
+            return self.net.forward(self.output_layers)
+
+    def detect(self, frame):
+        """
+        Run (or reuse) one forward pass for this frame.
+
+        :param frame: BGR image or FrameContext.
+        :return: list of (class_id, confidence, [x, y, w, h]) for every class.
+        """
+        context = FrameContext.wrap(frame)
+        with self._lock:
+            for seen, detections in self._recent:
+                if seen() is context.image:
+                    return detections
+
+        # Not holding _lock here, so frames from other cameras can join the same batch
+        height, width = context.shape[:2]
+        outs = self.forward(context)
+
+        class_ids, confidences, boxes = decode_outputs(outs, width, height, self.min_confidence)
+        detections = list(zip(class_ids.tolist(), confidences.tolist(), boxes.tolist()))
+
+        with self._lock:
+            self._recent.append((weakref.ref(context.image), detections))
+        return detections
+
+    def detect_classes(self, frame, class_names, conf_threshold, nms_score_threshold=0.5, nms_threshold=0.4):
+        """
+        Filter the shared detections down to class_names and apply NMS.
+
+        :return: list of (class_id, confidence, [x, y, w, h]) surviving NMS,
+                 highest confidence first.
+        """
+        wanted = set(self.class_ids(class_names))
+        candidates = [d for d in self.detect(frame) if d[0] in wanted and d[1] > conf_threshold]
+        if not candidates:
+            return []
+
+        boxes = [d[2] for d in candidates]
+        confidences = [d[1] for d in candidates]
+        indexes = cv2.dnn.NMSBoxes(boxes, confidences, nms_score_threshold, nms_threshold)
+        kept = sorted(np.array(indexes).flatten().tolist(), key=lambda i: confidences[i], reverse=True)
+        return [candidates[i] for i in kept]
+
+class YoloEngineDetector:
+    """
+    Base class for detectors that are views on a YoloEngine.
+
+    Without an engine the detector takes a reference on YoloEngine.shared(),
+    which close() gives back; an engine passed in stays the caller's.
+    """
+    def __init__(self, engine=None):
+        self._shared_engine = engine is None
+        self.engine = engine or YoloEngine.shared()
+
+    def close(self):
+        # Only the reference this detector took itself
+        if self._shared_engine:
+            self._shared_engine = False
+            self.engine.release()
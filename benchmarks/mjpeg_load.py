@@ -0,0 +1,310 @@
+# benchmarks/mjpeg_load.py
+#
+# Load generator for /video_feed: opens N concurrent multipart MJPEG viewers
+# against one or more NVR ports and measures, per viewer, time to first frame,
+# delivered FPS, inter-frame jitter and bytes per second. N is ramped up until
+# the slowest viewer falls below the FPS floor. Standard library only, so it
+# can run from another box.
+#
+#   python -m benchmarks.mjpeg_load [--url http://host:5001/video_feed/0 ...]
+#                                   [--start 1] [--max 256] [--growth 2]
+#                                   [--duration 10] [--settle 2]
+#                                   [--min-fps 10 | --min-fps-ratio 0.8] [--output report.json]
+#
+# With --serve N it first starts main.py on --port with N replay cameras
+# (--source, default synthetic; see app.sources) from a temporary settings
+# directory, so no camera is needed, and stops it at the end. The served
+# process gets its own database and recordings directory in that temporary
+# directory, and does not record unless --serve-recording asks it to.
+
+import argparse
+import http.client
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+MAIN_SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'main.py')
+# Served cameras are numbered from here, clear of real camera ids (and their nvr_cam<id> frame bus segments)
+SERVED_CAMERA_BASE_ID = 1000
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+class MultipartParser:
+    """
+    Splits a multipart/x-mixed-replace body into parts. A part ends after its
+    Content-Length if it has one, else at the JPEG end-of-image marker, so a
+    frame is counted when it arrives rather than when the next one starts.
+    """
+    def __init__(self, boundary):
+        self.delimiter = b'--' + boundary
+        self.buffer = bytearray()
+        self.length = None
+        self.in_body = False
+
+    def feed(self, data):
+        """Add received bytes; return the sizes of the parts they completed."""
+        self.buffer += data
+        sizes = []
+        while True:
+            if not self.in_body:
+                start = self.buffer.find(self.delimiter)
+                if start < 0:
+                    # Keep a tail that might hold the start of a split delimiter
+                    del self.buffer[:max(0, len(self.buffer) - len(self.delimiter))]
+                    return sizes
+                end = self.buffer.find(b'\r\n\r\n', start)
+                if end < 0:
+                    del self.buffer[:start]
+                    return sizes
+                self.length = None
+                for line in bytes(self.buffer[start:end]).split(b'\r\n')[1:]:
+                    name, _, value = line.partition(b':')
+                    if name.strip().lower() == b'content-length':
+                        self.length = int(value.strip())
+                del self.buffer[:end + 4]
+                self.in_body = True
+            if self.length is not None:
+                if len(self.buffer) < self.length:
+                    return sizes
+                size = self.length
+            else:
+                eoi = self.buffer.find(b'\xff\xd9')
+                if eoi < 0:
+                    return sizes
+                size = eoi + 2
+            del self.buffer[:size]
+            sizes.append(size)
+            self.in_body = False
+
+class Viewer(threading.Thread):
+    """One MJPEG client, reading frames as fast as the server sends them until stopped."""
+    def __init__(self, url, stop_event, timeout=10.0):
+        super().__init__(name=f"viewer-{url}", daemon=True)
+        self.url = url
+        self.stop_event = stop_event
+        self.timeout = timeout
+        self.started = None
+        self.first_frame = None
+        self.arrivals = []
+        self.frame_bytes = []
+        self.received = []  # (time, byte count) per read
+        self.error = None
+
+    def run(self):
+        parts = urllib.parse.urlsplit(self.url)
+        self.started = time.monotonic()
+        connection = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=self.timeout)
+        try:
+            connection.request('GET', parts.path or '/')
+            response = connection.getresponse()
+            content_type = response.getheader('Content-Type', '')
+            if response.status != 200 or 'boundary=' not in content_type:
+                self.error = f"HTTP {response.status} {content_type}"
+                return
+            boundary = content_type.split('boundary=', 1)[1].split(';')[0].strip().strip('"')
+            parser = MultipartParser(boundary.encode())
+            while not self.stop_event.is_set():
+                data = response.read1(65536)
+                if not data:
+                    self.error = "server closed the stream"
+                    return
+                now = time.monotonic()
+                self.received.append((now, len(data)))
+                for size in parser.feed(data):
+                    if self.first_frame is None:
+                        self.first_frame = now
+                    self.arrivals.append(now)
+                    self.frame_bytes.append(size)
+        except (OSError, http.client.HTTPException) as e:
+            if not self.stop_event.is_set():
+                self.error = f"{type(e).__name__}: {e}"
+        finally:
+            connection.close()
+
+    def stats(self, window_start, window_end):
+        """Delivery over [window_start, window_end]."""
+        arrivals = [t for t in self.arrivals if window_start <= t <= window_end]
+        gaps = [b - a for a, b in zip(arrivals, arrivals[1:])]
+        mean_gap = sum(gaps) / len(gaps) if gaps else None
+        window = window_end - window_start
+        return {
+            "url": self.url,
+            "time_to_first_frame_s": self.first_frame - self.started if self.first_frame is not None else None,
+            "frames": len(arrivals),
+            "fps": len(arrivals) / window if window > 0 else None,
+            "jitter_ms": (sum((g - mean_gap) ** 2 for g in gaps) / len(gaps)) ** 0.5 * 1000.0 if gaps else None,
+            "max_gap_ms": max(gaps) * 1000.0 if gaps else None,
+            "bytes_per_second": sum(n for t, n in self.received if window_start <= t <= window_end) / window if window > 0 else None,
+            "mean_frame_bytes": sum(self.frame_bytes) / len(self.frame_bytes) if self.frame_bytes else None,
+            "error": self.error,
+        }
+
+def run_step(urls, clients, settle, duration, timeout):
+    stop = threading.Event()
+    viewers = [Viewer(urls[i % len(urls)], stop, timeout) for i in range(clients)]
+    for viewer in viewers:
+        viewer.start()
+    time.sleep(settle)
+    window_start = time.monotonic()
+    time.sleep(duration)
+    window_end = time.monotonic()
+    stop.set()
+    for viewer in viewers:
+        viewer.join(timeout)
+
+    per_client = [viewer.stats(window_start, window_end) for viewer in viewers]
+    fps = sorted(c["fps"] or 0.0 for c in per_client)
+    ttff = sorted(c["time_to_first_frame_s"] for c in per_client if c["time_to_first_frame_s"] is not None)
+    jitter = sorted(c["jitter_ms"] for c in per_client if c["jitter_ms"] is not None)
+    return {
+        "clients": clients,
+        "fps": {"min": fps[0], "p50": percentile(fps, 0.50), "mean": sum(fps) / len(fps)},
+        "time_to_first_frame_s": {"p50": percentile(ttff, 0.50), "max": ttff[-1] if ttff else None},
+        "jitter_ms": {"p50": percentile(jitter, 0.50), "p95": percentile(jitter, 0.95)},
+        "total_bytes_per_second": sum(c["bytes_per_second"] or 0.0 for c in per_client),
+        "errors": sum(1 for c in per_client if c["error"] or c["time_to_first_frame_s"] is None),
+        "per_client": per_client,
+    }
+
+def format_row(step):
+    return (f"{step['clients']:>5} clients  fps min {step['fps']['min']:>6.1f}  p50 {step['fps']['p50']:>6.1f}  "
+            f"ttff p50 {step['time_to_first_frame_s']['p50'] or 0:>6.3f} s  jitter p95 {step['jitter_ms']['p95'] or 0:>7.1f} ms  "
+            f"{step['total_bytes_per_second'] / 1024 ** 2:>7.1f} MB/s  errors {step['errors']}")
+
+def write_replay_settings(settings_dir, cameras, source, source_fps):
+    for camera_id in range(SERVED_CAMERA_BASE_ID, SERVED_CAMERA_BASE_ID + cameras):
+        with open(os.path.join(settings_dir, f'camera_{camera_id}.py'), 'w') as f:
+            f.write(f"camera_id = {camera_id}\n")
+            f.write(f"source = {source!r}\n")
+            f.write(f"source_fps = {source_fps!r}\n")
+
+def start_server(args):
+    """
+    Start main.py with args.serve replay cameras; return (process, work_dir).
+    Everything it writes goes under work_dir, away from the real database and recordings.
+    """
+    work_dir = tempfile.mkdtemp(prefix='nvr_load_')
+    settings_dir = os.path.join(work_dir, 'settings')
+    os.makedirs(settings_dir)
+    # The server runs in work_dir, so a relative clip path would no longer resolve
+    source = os.path.abspath(args.source) if os.path.exists(args.source) else args.source
+    write_replay_settings(settings_dir, args.serve, source, args.source_fps)
+    log = open(args.server_log, 'w') if args.server_log else subprocess.DEVNULL
+    process = subprocess.Popen([sys.executable, MAIN_SCRIPT, '--port', str(args.port), '--settings_dir', settings_dir,
+                                '--database', os.path.join(work_dir, 'nvr.db'),
+                                '--recordings_dir', os.path.join(work_dir, 'recordings'),
+                                '--recording', args.serve_recording],
+                               cwd=work_dir, stdout=log, stderr=subprocess.STDOUT)
+    if log is not subprocess.DEVNULL:
+        log.close()  # the server has its own copy
+    deadline = time.monotonic() + args.startup_timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise SystemExit(f"Server exited with code {process.returncode} during startup")
+        try:
+            with urllib.request.urlopen(f"http://localhost:{args.port}/health", timeout=2) as response:
+                if response.status == 200:
+                    return process, work_dir
+        except (urllib.error.URLError, OSError):
+            pass
+        time.sleep(0.5)
+    stop_server(process, work_dir)
+    raise SystemExit(f"Server on port {args.port} not healthy after {args.startup_timeout}s")
+
+def stop_server(process, work_dir):
+    process.terminate()
+    try:
+        process.wait(10)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+    shutil.rmtree(work_dir, ignore_errors=True)
+
+def run(args):
+    urls = args.url or ([f"http://localhost:{args.port}/video_feed/{SERVED_CAMERA_BASE_ID + i}" for i in range(args.serve)] if args.serve
+                        else [f"http://localhost:{args.port}/video_feed/0"])
+    steps = []
+    floor = args.min_fps
+    clients = args.start
+    while clients <= args.max:
+        step = run_step(urls, clients, args.settle, args.duration, args.timeout)
+        steps.append(step)
+        print(format_row(step), file=sys.stderr)
+        if floor is None:
+            # Relative to what a single uncontended step delivered
+            floor = step["fps"]["p50"] * args.min_fps_ratio
+        if step["errors"] or step["fps"]["min"] < floor:
+            break
+        clients = max(clients + 1, int(clients * args.growth))
+
+    passed = [s for s in steps if not s["errors"] and s["fps"]["min"] >= floor]
+    return {
+        "meta": {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "cpu_count": os.cpu_count(),
+            "urls": urls,
+            "served_cameras": args.serve,
+            "source": args.source if args.serve else None,
+            "served_recording": args.serve_recording if args.serve else None,
+            "duration": args.duration,
+            "settle": args.settle,
+            "fps_floor": floor,
+        },
+        "max_clients_above_floor": passed[-1]["clients"] if passed else 0,
+        "steps": steps,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='Concurrent MJPEG viewer load test')
+    parser.add_argument('--url', action='append', help='Stream URL; repeat to spread viewers round-robin over several')
+    parser.add_argument('--port', type=int, default=5001, help='NVR port for the default URLs and --serve')
+    parser.add_argument('--start', type=int, default=1, help='Viewers in the first step')
+    parser.add_argument('--max', type=int, default=256, help='Stop ramping past this many viewers')
+    parser.add_argument('--growth', type=float, default=2.0, help='Multiply viewers by this each step')
+    parser.add_argument('--duration', type=float, default=10.0, help='Measured seconds per step')
+    parser.add_argument('--settle', type=float, default=2.0, help='Unmeasured seconds after connecting')
+    parser.add_argument('--timeout', type=float, default=10.0, help='Socket timeout per viewer')
+    parser.add_argument('--min-fps', type=float, help='FPS floor for the slowest viewer')
+    parser.add_argument('--min-fps-ratio', type=float, default=0.8,
+                        help='Without --min-fps, the floor as a fraction of the first step\'s median FPS')
+    parser.add_argument('--serve', type=int, default=0, metavar='CAMERAS', help='Start a local server with this many replay cameras')
+    parser.add_argument('--source', default='synthetic:1280x720', help='Frame source of the served cameras')
+    parser.add_argument('--source-fps', type=float, default=15.0, help='Frame rate of the served cameras')
+    parser.add_argument('--serve-recording', choices=['off', 'continuous', 'event'], default='off',
+                        help='Recording mode of the served cameras (into the temporary directory)')
+    parser.add_argument('--startup-timeout', type=float, default=60.0)
+    parser.add_argument('--server-log', help='Write the served main.py output here (default: discard)')
+    parser.add_argument('--output', help='JSON report file (default: stdout)')
+    args = parser.parse_args()
+
+    server = start_server(args) if args.serve else None
+    try:
+        report = run(args)
+    finally:
+        if server is not None:
+            stop_server(*server)
+
+    print(f"{report['max_clients_above_floor']} viewer(s) kept at least {report['meta']['fps_floor']:.1f} fps", file=sys.stderr)
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+if __name__ == '__main__':
+    main()
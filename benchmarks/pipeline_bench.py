@@ -0,0 +1,297 @@
+# benchmarks/pipeline_bench.py
+#
+# Headless benchmark of the per-frame work of the pipeline: motion detection,
+# every detector and the MJPEG encoder, fed from recorded video or synthetic
+# frames at several resolutions and camera counts. No camera or display needed.
+#
+#   python -m benchmarks.pipeline_bench run [--video clip.mp4] [--components motion,encode,vehicle]
+#                                           [--resolutions 640x360,1280x720] [--cameras 1,4]
+#                                           [--frames 200] [--output results.json]
+#   python -m benchmarks.pipeline_bench compare baseline.json results.json [--tolerance 0.1]
+#
+# compare exits with status 1 if any scenario lost more than tolerance of its
+# throughput, gained more than tolerance on its p95 latency, or failed where
+# the baseline did not.
+
+import argparse
+import importlib
+import json
+import os
+import platform
+import resource
+import sys
+import threading
+import time
+import cv2
+import numpy as np
+from app.detector import MotionDetector
+from app.frame_context import FrameContext
+from app.model_registry import DETECTOR_CLASSES, ModelPool
+from config import MOTION_WORKING_WIDTH, MOTION_GRAYSCALE
+
+COMPONENTS = ['motion', 'encode'] + list(DETECTOR_CLASSES)
+
+def synthetic_frames(width, height, count, seed=0):
+    """Noisy static background with a few rectangles moving across it, so motion has something to find."""
+    rng = np.random.default_rng(seed)
+    background = rng.integers(0, 60, (height, width, 3), dtype=np.uint8)
+    frames = []
+    for i in range(count):
+        frame = background.copy()
+        for k in range(3):
+            size = height // (6 + 2 * k)
+            x = (i * (4 + 3 * k) + k * width // 3) % max(1, width - size)
+            y = (height // 4 + k * height // 5) % max(1, height - size)
+            cv2.rectangle(frame, (x, y), (x + size, y + size), (200, 180 - 40 * k, 90 + 50 * k), -1)
+        frames.append(frame)
+    return frames
+
+def video_frames(path, width, height, count):
+    """Up to count frames of path, resized and decoded up front so decoding is not timed; loops short clips."""
+    capture = cv2.VideoCapture(path)
+    if not capture.isOpened():
+        raise IOError(f"Cannot open video {path}")
+    frames = []
+    while len(frames) < count:
+        ret, frame = capture.read()
+        if not ret:
+            if not frames:
+                raise IOError(f"No frames in {path}")
+            capture.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            continue
+        frames.append(cv2.resize(frame, (width, height), interpolation=cv2.INTER_AREA))
+    capture.release()
+    return frames
+
+def reset_peak_rss():
+    """Restart the kernel's peak RSS count (VmHWM) so each scenario reports its own; False where unsupported."""
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+def peak_rss_bytes():
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    # Peak of the whole run; ru_maxrss is in kilobytes on Linux, bytes on macOS
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * (1 if sys.platform == 'darwin' else 1024)
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+def make_worker(component, shared):
+    """Per-camera callable processing one frame, like the engine's stages do."""
+    if component == 'motion':
+        detector = MotionDetector(working_width=MOTION_WORKING_WIDTH, grayscale=MOTION_GRAYSCALE)
+        return lambda frame: detector.detect_regions(FrameContext(frame))
+    if component == 'encode':
+        params = [int(cv2.IMWRITE_JPEG_QUALITY), 80]
+        return lambda frame: cv2.imencode('.jpg', frame, params)
+    # Detectors are shared between cameras the way ModelRegistry._load shares
+    # them: backends that are not thread-safe behind a ModelPool
+    if component not in shared:
+        module_name, class_name, pool_size = DETECTOR_CLASSES[component]
+        factory = getattr(importlib.import_module(module_name), class_name)
+        detector = factory()
+        shared[component] = ModelPool(component, factory, detector, pool_size) if pool_size else detector
+    detector = shared[component]
+    return lambda frame: detector.detect(FrameContext(frame))
+
+def run_scenario(component, frames, cameras, warmup, shared):
+    workers = [make_worker(component, shared) for _ in range(cameras)]
+    latencies = [[] for _ in range(cameras)]
+    # Cameras never hand a detector the same array, so YoloEngine's per-frame
+    # cache cannot answer one camera's frame with another's result. The copy
+    # is outside the latency measurement (not the wall clock, as in the engine)
+    fresh = component in DETECTOR_CLASSES
+    # Every camera finishes warming up before the clock starts
+    ready = threading.Barrier(cameras + 1)
+    errors = []
+    reset_peak_rss()
+
+    def feed(index):
+        work = workers[index]
+        try:
+            try:
+                for frame in frames[:warmup]:
+                    work(frame.copy() if fresh else frame)
+            finally:
+                ready.wait()
+            times = latencies[index]
+            for frame in frames[warmup:]:
+                if fresh:
+                    frame = frame.copy()
+                started = time.perf_counter()
+                work(frame)
+                times.append(time.perf_counter() - started)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=feed, args=(i,), name=f"bench-cam{i}") for i in range(cameras)]
+    for thread in threads:
+        thread.start()
+    ready.wait()
+    started = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - started
+    if errors:
+        raise errors[0]
+
+    values = sorted(t * 1000.0 for times in latencies for t in times)
+    return {
+        "frames": len(values),
+        "wall_seconds": wall,
+        "throughput_fps": len(values) / wall if wall > 0 else None,
+        "latency_ms": {
+            "mean": sum(values) / len(values) if values else None,
+            "p50": percentile(values, 0.50),
+            "p95": percentile(values, 0.95),
+            "p99": percentile(values, 0.99),
+        },
+        "peak_rss_bytes": peak_rss_bytes(),
+    }
+
+def run(args):
+    resolutions = [tuple(int(v) for v in r.split('x')) for r in args.resolutions.split(',')]
+    camera_counts = [int(c) for c in args.cameras.split(',')]
+    components = args.components.split(',')
+    for component in components:
+        if component not in COMPONENTS:
+            raise SystemExit(f"Unknown component {component}; choose from {', '.join(COMPONENTS)}")
+
+    results = []
+    shared = {}
+    rss_per_scenario = reset_peak_rss()
+    for width, height in resolutions:
+        total = args.frames + args.warmup
+        frames = video_frames(args.video, width, height, total) if args.video else synthetic_frames(width, height, total)
+        for component in components:
+            for cameras in camera_counts:
+                scenario = {"component": component, "resolution": f"{width}x{height}", "cameras": cameras}
+                try:
+                    scenario.update(run_scenario(component, frames, cameras, args.warmup, shared))
+                except Exception as e:
+                    # Missing model files or libraries: record and carry on with the rest
+                    scenario["error"] = f"{type(e).__name__}: {e}"
+                    shared.pop(component, None)
+                results.append(scenario)
+                print(format_row(scenario), file=sys.stderr)
+
+    report = {
+        "meta": {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "opencv": cv2.__version__,
+            "cpu_count": os.cpu_count(),
+            "machine": platform.machine(),
+            "source": args.video or "synthetic",
+            "frames": args.frames,
+            "warmup": args.warmup,
+            "peak_rss": "per scenario" if rss_per_scenario else "whole run so far",
+        },
+        "results": results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+def format_row(scenario):
+    name = f"{scenario['component']:<10} {scenario['resolution']:>10} x{scenario['cameras']:<3}"
+    if "error" in scenario:
+        return f"{name} skipped: {scenario['error']}"
+    latency = scenario["latency_ms"]
+    return (f"{name} {scenario['throughput_fps']:>9.1f} fps  p50 {latency['p50']:>8.2f} ms  "
+            f"p95 {latency['p95']:>8.2f} ms  p99 {latency['p99']:>8.2f} ms  rss {scenario['peak_rss_bytes'] / 1024 ** 2:>7.0f} MB")
+
+def scenario_key(scenario):
+    return scenario["component"], scenario["resolution"], scenario["cameras"]
+
+def relative_change(now, before):
+    """now / before - 1, with a zero baseline counted as unchanged or as an unbounded change."""
+    if before:
+        return now / before - 1.0
+    return 0.0 if now == before else float('inf')
+
+def compare(args):
+    """
+    Exit status 1 if any scenario regressed beyond tolerance or newly fails.
+
+    Scenarios with no baseline are listed but cannot regress.
+    """
+    with open(args.baseline) as f:
+        baseline = {scenario_key(s): s for s in json.load(f)["results"]}
+    with open(args.current) as f:
+        current = json.load(f)["results"]
+
+    regressions = 0
+    failures = 0
+    print(f"{'scenario':<28} {'fps base':>9} {'fps now':>9} {'change':>8} {'p95 base':>9} {'p95 now':>9} {'change':>8}")
+    for scenario in current:
+        name = "{} {} x{}".format(*scenario_key(scenario))
+        before = baseline.pop(scenario_key(scenario), None)
+        if "error" in scenario:
+            if before is not None and "error" in before:
+                print(f"{name:<28} still failing: {scenario['error']}")
+            else:
+                print(f"{name:<28} FAILED: {scenario['error']}")
+                failures += 1
+            continue
+        if before is None or "error" in before:
+            reason = "no baseline" if before is None else "failed in baseline"
+            print(f"{name:<28} {'-':>9} {scenario['throughput_fps']:>9.1f} {'-':>8} "
+                  f"{'-':>9} {scenario['latency_ms']['p95']:>9.2f} {'-':>8}  ({reason})")
+            continue
+        fps_change = relative_change(scenario["throughput_fps"], before["throughput_fps"])
+        p95_change = relative_change(scenario["latency_ms"]["p95"], before["latency_ms"]["p95"])
+        flag = ""
+        if fps_change < -args.tolerance or p95_change > args.tolerance:
+            flag = "  REGRESSION"
+            regressions += 1
+        print(f"{name:<28} {before['throughput_fps']:>9.1f} {scenario['throughput_fps']:>9.1f} {fps_change:>+8.1%} "
+              f"{before['latency_ms']['p95']:>9.2f} {scenario['latency_ms']['p95']:>9.2f} {p95_change:>+8.1%}{flag}")
+    for key in baseline:
+        print("{:<28} not in the current run".format("{} {} x{}".format(*key)))
+
+    print(f"{regressions} regression(s) beyond {args.tolerance:.0%}, {failures} new failure(s)")
+    return 1 if regressions or failures else 0
+
+def main():
+    parser = argparse.ArgumentParser(description='Replay benchmark for the detection pipeline')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = commands.add_parser('run', help='Run the benchmark and write JSON results')
+    run_parser.add_argument('--video', help='Recorded clip to replay (default: synthetic frames)')
+    run_parser.add_argument('--components', default='motion,encode', help=f"Comma-separated, from {','.join(COMPONENTS)}")
+    run_parser.add_argument('--resolutions', default='640x360,1280x720,1920x1080')
+    run_parser.add_argument('--cameras', default='1,4', help='Comma-separated camera counts, each run concurrently')
+    run_parser.add_argument('--frames', type=int, default=200, help='Timed frames per camera')
+    run_parser.add_argument('--warmup', type=int, default=10, help='Untimed frames per camera first')
+    run_parser.add_argument('--output', help='JSON file (default: stdout)')
+
+    compare_parser = commands.add_parser('compare', help='Flag regressions of one result file against another')
+    compare_parser.add_argument('baseline')
+    compare_parser.add_argument('current')
+    compare_parser.add_argument('--tolerance', type=float, default=0.10, help='Allowed fractional change')
+
+    args = parser.parse_args()
+    if args.command == 'run':
+        run(args)
+    else:
+        sys.exit(compare(args))
+
+if __name__ == '__main__':
+    main()
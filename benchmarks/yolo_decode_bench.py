@@ -0,0 +1,87 @@
+# benchmarks/yolo_decode_bench.py
+#
+# Micro-benchmark for YOLO output decoding: the per-row Python loop the
+# detectors used to run versus app.yolo_engine.decode_outputs.
+#
+#   python -m benchmarks.yolo_decode_bench [--repeat 200]
+
+import argparse
+import time
+import numpy as np
+from app.yolo_engine import decode_outputs, class_threshold_table
+
+# Grid strides of the three YOLOv3 output layers (yolov3-tiny uses the first two)
+STRIDES = {'yolov3': (32, 16, 8), 'yolov3-tiny': (32, 16)}
+ANCHORS_PER_CELL = 3
+NUM_CLASSES = 80
+
+def synthetic_outputs(input_size, model, rng):
+    """Output layers with realistic sparsity: almost every row scores near zero."""
+    outs = []
+    for stride in STRIDES[model]:
+        cells = (input_size // stride) ** 2 * ANCHORS_PER_CELL
+        out = np.empty((cells, 5 + NUM_CLASSES), dtype=np.float32)
+        out[:, 0:4] = rng.random((cells, 4), dtype=np.float32)
+        out[:, 4] = rng.random(cells, dtype=np.float32) * 0.1
+        out[:, 5:] = rng.random((cells, NUM_CLASSES), dtype=np.float32) * 0.05
+        hits = rng.choice(cells, size=max(1, cells // 200), replace=False)
+        out[hits, 5 + rng.integers(0, NUM_CLASSES, size=len(hits))] = rng.uniform(0.3, 1.0, size=len(hits))
+        outs.append(out)
+    return outs
+
+def legacy_decode(outs, width, height, wanted_class_ids, conf_threshold):
+    """The loop previously found in VehicleDetector/AnimalDetector.detect_and_draw."""
+    class_ids = []
+    confidences = []
+    boxes = []
+    for out in outs:
+        for detection in out:
+            scores = detection[5:]
+            class_id = np.argmax(scores)
+            confidence = scores[class_id]
+            if class_id in wanted_class_ids and confidence > conf_threshold:
+                center_x = int(detection[0] * width)
+                center_y = int(detection[1] * height)
+                w = int(detection[2] * width)
+                h = int(detection[3] * height)
+                x = int(center_x - w / 2)
+                y = int(center_y - h / 2)
+                boxes.append([x, y, w, h])
+                confidences.append(float(confidence))
+                class_ids.append(class_id)
+    return class_ids, confidences, boxes
+
+def time_per_call(fn, repeat):
+    fn()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1000.0
+
+def main():
+    parser = argparse.ArgumentParser(description='YOLO decode micro-benchmark')
+    parser.add_argument('--repeat', type=int, default=200)
+    parser.add_argument('--frame', default='1280x720', help='Frame size boxes are scaled to')
+    args = parser.parse_args()
+
+    width, height = (int(v) for v in args.frame.split('x'))
+    rng = np.random.default_rng(0)
+    wanted = [2, 3, 5, 7]  # car, motorbike, bus, truck
+    thresholds = class_threshold_table(NUM_CLASSES, [(wanted, 0.39)])
+
+    print(f"{'model':<12} {'input':>7} {'rows':>7} {'loop ms':>9} {'numpy ms':>9} {'speedup':>8}")
+    for model in ('yolov3-tiny', 'yolov3'):
+        for input_size in (416, 608):
+            outs = synthetic_outputs(input_size, model, rng)
+            rows = sum(len(out) for out in outs)
+
+            legacy = legacy_decode(outs, width, height, wanted, 0.39)
+            vectorized = decode_outputs(outs, width, height, class_thresholds=thresholds)
+            assert legacy[2] == vectorized[2].tolist(), "decoders disagree"
+
+            loop_ms = time_per_call(lambda: legacy_decode(outs, width, height, wanted, 0.39), max(1, args.repeat // 20))
+            numpy_ms = time_per_call(lambda: decode_outputs(outs, width, height, class_thresholds=thresholds), args.repeat)
+            print(f"{model:<12} {input_size:>7} {rows:>7} {loop_ms:>9.3f} {numpy_ms:>9.3f} {loop_ms / numpy_ms:>7.1f}x")
+
+if __name__ == '__main__':
+    main()
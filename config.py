@@ -2,3 +2,89 @@ import os
 
 BASE_DIR = os.path.abspath(os.path.dirname(__file__))
 DATABASE_URI = 'database/nvr.db'
+CAMERA_SETTINGS_DIR = os.path.join(BASE_DIR, 'configs', 'NVR_camsettings')
+
+# Cross-camera batched YOLO inference (app/inference_server.py)
+INFERENCE_BATCHING = False
+INFERENCE_BATCH_SIZE = 8
+INFERENCE_MAX_WAIT_MS = 5
+
+# Run detectors in this many worker processes instead of engine threads
+# (app/process_pool.py); 0 keeps them in-process. INFERENCE_PROCESS_CPUS is
+# a list of CPU sets, one per worker, e.g. [[2], [3]]; each worker caps
+# OpenCV at INFERENCE_PROCESS_CV2_THREADS threads. Frames are passed through
+# shared memory slots of INFERENCE_SHM_SLOT_MB each, grown for larger frames.
+INFERENCE_PROCESSES = 0
+INFERENCE_PROCESS_CPUS = None
+INFERENCE_PROCESS_CV2_THREADS = 1
+INFERENCE_SHM_SLOT_MB = 8
+
+# Run heavy detectors only while there is motion, on padded crops around it
+MOTION_GATING = True
+ROI_PADDING = 32
+ROI_MAX_AREA_FRACTION = 0.6
+
+# Motion detection working resolution; per-camera overrides and include/exclude
+# zones go in configs/NVR_camsettings/camera_<id>.py (motion_* keys)
+MOTION_WORKING_WIDTH = 320
+MOTION_GRAYSCALE = True
+MOTION_FRAME_STRIDE = 1
+
+# Run each detector every N frames (or every INTERVAL seconds, if set) and let
+# the tracker carry boxes in between
+TRACKER_DETECT_EVERY_N_FRAMES = 5
+TRACKER_DETECT_INTERVAL = None
+
+# Per-camera stage queues (app/pipeline.py). Recording blocks rather than
+# dropping; motion drops its oldest frames; detection keeps only the latest.
+PIPELINE_RECORD_QUEUE_SIZE = 240
+PIPELINE_MOTION_QUEUE_SIZE = 4
+
+# Segmented recording and retention (app/recorder.py, app/database.py).
+# RECORDING_MODE 'event' records only around motion/detections, with a pre-roll;
+# 'off' records nothing.
+RECORDING_MODE = 'continuous'
+RECORDINGS_DIR = os.path.join(BASE_DIR, 'recordings')
+RECORDING_SEGMENT_SECONDS = 120
+RETENTION_MAX_AGE_DAYS = 7
+RETENTION_MAX_GB = None
+RETENTION_CHECK_INTERVAL = 60
+
+EVENT_PRE_ROLL_SECONDS = 5
+EVENT_POST_ROLL_SECONDS = 10
+EVENT_PRE_ROLL_MAX_MB = 64
+EVENT_PRE_ROLL_JPEG = True
+
+# Event store (app/database.py). Seconds between stored rows for the same
+# tracked object, and between motion rows of one camera.
+EVENTS_TRACK_INTERVAL = 10
+EVENTS_MOTION_INTERVAL = 5
+
+# Detectors nobody has enabled for this long are unloaded (app/model_registry.py)
+MODEL_IDLE_UNLOAD_SECONDS = 300
+
+# Person detector backend: 'mediapipe' (pose landmarks, one person per frame)
+# or 'yolo' (every person box from the COCO engine vehicle/animal already run)
+PERSON_DETECTOR = 'mediapipe'
+
+# Publish raw frames into shared memory segments nvr_cam<id> for other local
+# processes (app/frame_bus.py), in a ring of FRAME_BUS_SLOTS frames
+FRAME_BUS = False
+FRAME_BUS_SLOTS = 8
+
+# Supervisor (supervisor.py, app/supervisor.py). One NVR worker process per
+# group of camera ids (default: one per camera in CAMERA_SETTINGS_DIR), on
+# SUPERVISOR_BASE_PORT + index. SUPERVISOR_CPUS is a list of CPU sets, one
+# per worker; None spreads workers over the available cores. A worker whose
+# /health fails for SUPERVISOR_STALL_SECONDS (after SUPERVISOR_STARTUP_GRACE)
+# is restarted, with exponential backoff up to SUPERVISOR_BACKOFF_MAX.
+SUPERVISOR_CAMERA_GROUPS = None
+SUPERVISOR_BASE_PORT = 5001
+SUPERVISOR_CPUS = None
+SUPERVISOR_HEALTH_INTERVAL = 5
+SUPERVISOR_HEALTH_TIMEOUT = 2
+SUPERVISOR_STARTUP_GRACE = 30
+SUPERVISOR_STALL_SECONDS = 30
+SUPERVISOR_BACKOFF_MAX = 60
+SUPERVISOR_STOP_TIMEOUT = 10
+HEALTH_MAX_FRAME_AGE = 10
@@ -0,0 +1,29 @@
+import argparse
+import logging
+import signal
+from app.supervisor import Supervisor, default_camera_groups
+from config import CAMERA_SETTINGS_DIR, SUPERVISOR_CAMERA_GROUPS, SUPERVISOR_BASE_PORT, SUPERVISOR_CPUS, \
+    SUPERVISOR_HEALTH_INTERVAL, SUPERVISOR_HEALTH_TIMEOUT, SUPERVISOR_STARTUP_GRACE, SUPERVISOR_STALL_SECONDS, \
+    SUPERVISOR_BACKOFF_MAX, SUPERVISOR_STOP_TIMEOUT
+
+logging.basicConfig(level=logging.INFO)
+
+def main():
+    parser = argparse.ArgumentParser(description='Run and supervise one NVR worker per camera group')
+    parser.add_argument('--base_port', type=int, default=SUPERVISOR_BASE_PORT, help='Port of the first worker; the others follow')
+    args = parser.parse_args()
+
+    groups = SUPERVISOR_CAMERA_GROUPS or default_camera_groups(CAMERA_SETTINGS_DIR)
+    supervisor = Supervisor(groups, args.base_port, SUPERVISOR_CPUS,
+                            health_interval=SUPERVISOR_HEALTH_INTERVAL,
+                            health_timeout=SUPERVISOR_HEALTH_TIMEOUT,
+                            startup_grace=SUPERVISOR_STARTUP_GRACE,
+                            stall_seconds=SUPERVISOR_STALL_SECONDS,
+                            backoff_max=SUPERVISOR_BACKOFF_MAX,
+                            stop_timeout=SUPERVISOR_STOP_TIMEOUT)
+    signal.signal(signal.SIGTERM, supervisor.stop)
+    signal.signal(signal.SIGINT, supervisor.stop)
+    supervisor.run()
+
+if __name__ == "__main__":
+    main()